@@ -0,0 +1,261 @@
+# app/cache.py
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .circuit_breaker import get_breaker
+from .metrics import CACHE_PAYLOAD_BYTES, CACHE_REQUESTS
+
+# TTL (detik) per timeframe. Window pendek berubah cepat → TTL pendek,
+# window panjang (7/30 hari) hampir tidak berubah dalam beberapa menit.
+TIMEFRAME_TTL = {
+    "last1minutes": 2,
+    "1minutes": 2,
+    "today": 10,
+    "1hours": 10,
+    "last1hours": 10,
+    "8hours": 20,
+    "last8hours": 20,
+    "24hours": 30,
+    "last24hours": 30,
+    "yesterday": 30,
+    "last3days": 60,
+    "last7days": 120,
+    "last30days": 300,
+    "last60days": 600,
+    "last90days": 600,
+}
+
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_MB", "256")) * 1024 * 1024
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CACHE_REFRESH_WORKERS = int(os.getenv("CACHE_REFRESH_WORKERS", "4"))
+
+
+def get_ttl(timeframe):
+    return TIMEFRAME_TTL.get(timeframe, CACHE_DEFAULT_TTL)
+
+
+def estimate_size(value):
+    """
+    Perkiraan kasar ukuran memori hasil fetch (list of dict / Event), cukup
+    untuk membatasi total cache. Tidak menelusuri lebih dari satu level.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            size += sys.getsizeof(item)
+            if isinstance(item, dict):
+                size += sum(sys.getsizeof(v) for v in item.values())
+            elif hasattr(item, "__slots__"):
+                size += sum(sys.getsizeof(getattr(item, f, None)) for f in item.__slots__)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "loaded_at", "size")
+
+    def __init__(self, value, expires_at, loaded_at, size):
+        self.value = value
+        self.expires_at = expires_at
+        self.loaded_at = loaded_at
+        self.size = size
+
+
+class TTLCache:
+    """
+    Cache in-process dengan TTL per timeframe, eviksi LRU dan batas memori.
+
+    get_or_load() bersifat single-flight: kalau beberapa request identik
+    datang bersamaan, hanya satu yang menjalankan loader (query ke
+    Elasticsearch), sisanya menunggu hasil yang sama.
+
+    Entry yang sudah kadaluarsa tidak langsung dibuang: itu hasil terakhir
+    yang valid (last-known-good) untuk get_or_load_stale().
+    """
+
+    def __init__(self, name, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale = 0
+        # Counter Prometheus per hasil lookup (child di-resolve sekali)
+        self._requests = {
+            result: CACHE_REQUESTS.labels(name, result)
+            for result in ("hit", "miss", "coalesced", "stale")
+        }
+        self._payload_bytes = CACHE_PAYLOAD_BYTES.labels(name)
+        self._refresh_pool = ThreadPoolExecutor(
+            max_workers=CACHE_REFRESH_WORKERS,
+            thread_name_prefix="cache-refresh"
+        )
+
+    def get_or_load(self, key, ttl, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._requests["hit"].inc()
+                return entry.value
+
+            future = self._inflight.get(key)
+            if future is not None:
+                # Sudah ada request identik yang sedang query → tunggu saja
+                self.coalesced += 1
+                self._requests["coalesced"].inc()
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+                self._requests["miss"].inc()
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    def get_or_load_stale(self, key, ttl, loader, degraded=None):
+        """
+        Seperti get_or_load, tapi return (value, stale_age).
+        stale_age None = hasil segar; selain itu umur (detik) hasil lama.
+
+        Hasil lama dikembalikan langsung (dan di-refresh di background)
+        kalau refresh untuk key ini sedang berjalan atau degraded() True
+        (mis. circuit breaker terbuka). Kalau refresh sinkron gagal, hasil
+        lama juga dipakai daripada melempar error.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._requests["hit"].inc()
+                return entry.value, None
+
+            if entry is not None and (key in self._inflight or (degraded is not None and degraded())):
+                if key not in self._inflight:
+                    future = Future()
+                    self._inflight[key] = future
+                    self._refresh_pool.submit(self._refresh, key, ttl, loader, future)
+                self.stale += 1
+                self._requests["stale"].inc()
+                return entry.value, now - entry.loaded_at
+
+        try:
+            return self.get_or_load(key, ttl, loader), None
+        except Exception:
+            if entry is None:
+                raise
+            with self._lock:
+                self.stale += 1
+            self._requests["stale"].inc()
+            return entry.value, time.monotonic() - entry.loaded_at
+
+    def _refresh(self, key, ttl, loader, future):
+        try:
+            value = loader()
+        except BaseException as e:
+            # Entry lama tetap disimpan sebagai last-known-good
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            return
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._store(key, value, ttl)
+        future.set_result(value)
+
+    def _store(self, key, value, ttl):
+        size = estimate_size(value)
+        self._payload_bytes.observe(size)
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old.size
+
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, now + ttl, now, size)
+        self._bytes += size
+
+        # Eviksi LRU sampai jumlah entry & memori di bawah batas
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "stale": self.stale,
+            }
+
+
+# Cache global untuk hasil fetcher per (source, index, timeframe, filter)
+event_cache = TTLCache("events")
+
+
+def cached_fetch(source, fetcher, es, index, timeframe, extra_filters=None, stale=None):
+    """
+    Fetch satu source lewat circuit breaker + cache.
+    stale (dict, opsional): diisi {source: umur_detik} kalau yang dikembalikan
+    adalah hasil lama (circuit terbuka / refresh sedang berjalan / refresh gagal).
+    """
+    breaker = get_breaker(source)
+
+    def load():
+        return breaker.call(fetcher, es, index, timeframe, extra_filters)
+
+    if not CACHE_ENABLED:
+        return load()
+
+    # Filter hasil pushdown ikut jadi bagian key
+    filter_key = json.dumps(extra_filters, sort_keys=True) if extra_filters else None
+    key = (source, index, timeframe, filter_key)
+    value, stale_age = event_cache.get_or_load_stale(
+        key, get_ttl(timeframe), load, degraded=breaker.is_open
+    )
+    if stale_age is not None and stale is not None:
+        stale[source] = round(stale_age, 1)
+    return value
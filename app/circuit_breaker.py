@@ -0,0 +1,134 @@
+# app/circuit_breaker.py
+import os
+import threading
+import time
+
+from elasticsearch.exceptions import ConnectionError as ESConnectionError, TransportError
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "3"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Source sedang dimatikan sementara karena Elasticsearch bermasalah."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit '{name}' is open")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_cluster_failure(error):
+    """Hanya error cluster (koneksi, timeout, 429, 5xx) yang membuka circuit."""
+    if isinstance(error, ESConnectionError):
+        return True
+    if isinstance(error, TransportError):
+        status = error.status_code
+        return status == "N/A" or status == 429 or (isinstance(status, int) and status >= 500)
+    return False
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker per source.
+
+    closed    : request jalan normal, kegagalan berturut-turut dihitung
+    open      : request langsung ditolak (CircuitOpenError) selama reset_seconds,
+                supaya cluster yang sedang bermasalah tidak makin dibebani
+    half_open : satu request percobaan; sukses → closed, gagal → open lagi
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def _retry_after(self):
+        return max(0.0, self.opened_at + self.reset_seconds - time.monotonic())
+
+    def is_open(self):
+        """True kalau request saat ini pasti ditolak (tanpa mengambil slot percobaan)."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                return True
+            return self.state == OPEN and self._retry_after() > 0
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._retry_after() <= 0:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"✅ Circuit '{self.name}' closed")
+            self.state = CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"⚠️ Circuit '{self.name}' open for {self.reset_seconds}s")
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        # Percobaan half-open selesai tanpa kesimpulan (error bukan dari cluster)
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            with self._lock:
+                retry_after = self._retry_after() if self.opened_at else self.reset_seconds
+            raise CircuitOpenError(self.name, retry_after)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            if is_cluster_failure(e):
+                self.record_failure()
+            else:
+                self.release()
+            raise
+        self.record_success()
+        return result
+
+    def status(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "retry_after": round(self._retry_after(), 1) if self.state == OPEN else None
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def circuit_status():
+    return {name: breaker.status() for name, breaker in sorted(_breakers.items())}
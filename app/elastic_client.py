@@ -33,49 +33,245 @@
 
 # app/elastic_client.py
 import os
+import threading
+import time
 import urllib3
-from elasticsearch import Elasticsearch, RequestsHttpConnection
+from elasticsearch import Elasticsearch, RequestsHttpConnection, Urllib3HttpConnection, Transport
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from .serialization import ORJSONSerializer
+from .circuit_breaker import circuit_status
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 load_dotenv()
 
+
+def _env_bool(name, default):
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
 ELASTIC_HOST = os.getenv("ELASTIC_HOST")
 ELASTIC_USER = os.getenv("ELASTIC_USER")
 ELASTIC_PASSWORD = os.getenv("ELASTIC_PASSWORD")
+# gzip request/response (Accept-Encoding), hemat bandwidth untuk hit & agregasi besar
+ELASTIC_HTTP_COMPRESS = _env_bool("ELASTIC_HTTP_COMPRESS", "true")
+
+# ======================================================
+# TRANSPORT SETTINGS
+# ======================================================
+# "urllib3" (pool koneksi keep-alive, default) atau "requests"
+ELASTIC_CONNECTION_CLASS = os.getenv("ELASTIC_CONNECTION_CLASS", "urllib3")
+# Koneksi per node: threadpool uvicorn (40) + _source_pool + thread background
+ELASTIC_MAXSIZE = int(os.getenv("ELASTIC_MAXSIZE", "80"))
+# Timeout default per request; agregasi berat memakai ELASTIC_AGG_TIMEOUT
+ELASTIC_TIMEOUT = float(os.getenv("ELASTIC_TIMEOUT", "5"))
+ELASTIC_AGG_TIMEOUT = float(os.getenv("ELASTIC_AGG_TIMEOUT", "15"))
+ELASTIC_MAX_RETRIES = int(os.getenv("ELASTIC_MAX_RETRIES", "2"))
+ELASTIC_RETRY_ON_TIMEOUT = _env_bool("ELASTIC_RETRY_ON_TIMEOUT", "true")
+ELASTIC_RETRY_BACKOFF = float(os.getenv("ELASTIC_RETRY_BACKOFF", "0.2"))
+ELASTIC_RETRY_BACKOFF_MAX = float(os.getenv("ELASTIC_RETRY_BACKOFF_MAX", "2"))
+# Sniffing hanya berguna untuk cluster multi-node yang bisa diakses langsung
+ELASTIC_SNIFF_ON_START = _env_bool("ELASTIC_SNIFF_ON_START", "false")
+ELASTIC_SNIFF_ON_CONNECTION_FAIL = _env_bool("ELASTIC_SNIFF_ON_CONNECTION_FAIL", "false")
+ELASTIC_SNIFFER_TIMEOUT = float(os.getenv("ELASTIC_SNIFFER_TIMEOUT", "0")) or None
+# Client lama (setelah reconnect) baru ditutup setelah jeda ini, supaya request
+# yang masih memakainya sempat selesai: timeout agregasi x percobaan + backoff
+ELASTIC_CLOSE_GRACE_SECONDS = float(os.getenv(
+    "ELASTIC_CLOSE_GRACE_SECONDS",
+    str(ELASTIC_AGG_TIMEOUT * (ELASTIC_MAX_RETRIES + 1) + ELASTIC_RETRY_BACKOFF_MAX * ELASTIC_MAX_RETRIES)
+))
+
+
+class PooledRequestsHttpConnection(RequestsHttpConnection):
+    """RequestsHttpConnection dengan ukuran pool yang bisa diatur (default requests = 10)."""
+
+    def __init__(self, *args, maxsize=10, **kwargs):
+        super().__init__(*args, **kwargs)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+
+CONNECTION_CLASSES = {
+    "urllib3": Urllib3HttpConnection,
+    "requests": PooledRequestsHttpConnection,
+}
 
-es = None
-elastic_connected = False
-elastic_error = None
 
-try:
-    es = Elasticsearch(
-        [ELASTIC_HOST],
-        connection_class=RequestsHttpConnection,
-        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD),
+class BackoffTransport(Transport):
+    """
+    Transport yang memberi jeda exponential backoff antar retry
+    (Transport bawaan langsung retry tanpa jeda).
+    """
+
+    def __init__(self, *args, backoff=ELASTIC_RETRY_BACKOFF, backoff_max=ELASTIC_RETRY_BACKOFF_MAX, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._local = threading.local()
+
+    def perform_request(self, *args, **kwargs):
+        self._local.failures = 0
+        return super().perform_request(*args, **kwargs)
+
+    def mark_dead(self, connection):
+        # Dipanggil sekali per percobaan gagal yang akan di-retry
+        super().mark_dead(connection)
+        failures = getattr(self._local, "failures", 0)
+        self._local.failures = failures + 1
+        if failures < self.max_retries and self.backoff > 0:
+            time.sleep(min(self.backoff * (2 ** failures), self.backoff_max))
+
+
+def build_client():
+    hosts = [h.strip() for h in (ELASTIC_HOST or "").split(",") if h.strip()]
+    return Elasticsearch(
+        hosts,
+        transport_class=BackoffTransport,
+        connection_class=CONNECTION_CLASSES[ELASTIC_CONNECTION_CLASS],
+        http_auth=(ELASTIC_USER, ELASTIC_PASSWORD) if ELASTIC_USER else None,
         use_ssl=True,
         verify_certs=False,
-        timeout=5
+        ssl_show_warn=False,
+        maxsize=ELASTIC_MAXSIZE,
+        timeout=ELASTIC_TIMEOUT,
+        max_retries=ELASTIC_MAX_RETRIES,
+        retry_on_timeout=ELASTIC_RETRY_ON_TIMEOUT,
+        sniff_on_start=ELASTIC_SNIFF_ON_START,
+        sniff_on_connection_fail=ELASTIC_SNIFF_ON_CONNECTION_FAIL,
+        sniffer_timeout=ELASTIC_SNIFFER_TIMEOUT,
+        http_compress=ELASTIC_HTTP_COMPRESS,
+        serializer=ORJSONSerializer()
     )
 
-    # 🔍 Ping ringan (lebih aman dari authenticate)
-    if es.ping():
-        elastic_connected = True
-    else:
-        elastic_error = "Ping failed"
 
-except Exception as e:
-    elastic_error = str(e)
-    es = None
+# ======================================================
+# CLIENT MANAGER
+# ======================================================
+ELASTIC_HEALTH_INTERVAL_SECONDS = float(os.getenv("ELASTIC_HEALTH_INTERVAL_SECONDS", "10"))
+ELASTIC_HEALTH_TIMEOUT = float(os.getenv("ELASTIC_HEALTH_TIMEOUT", "3"))
+# Client dibangun ulang setelah N health check gagal berturut-turut
+ELASTIC_RECONNECT_AFTER = int(os.getenv("ELASTIC_RECONNECT_AFTER", "3"))
+
+
+def _close_client(client):
+    if client is None:
+        return
+    try:
+        client.close()
+    except Exception:
+        pass
+
+
+class ElasticClientManager:
+    """
+    Pemilik client Elasticsearch.
+
+    Client dibuat lazy (tanpa network), health check (ping) berjalan di
+    thread background sehingga startup worker tidak menunggu cluster, dan
+    client dibangun ulang otomatis kalau cluster tidak sehat beberapa kali
+    berturut-turut. get_elastic_status() membaca state live dari sini.
+    """
+
+    def __init__(self, interval_seconds=ELASTIC_HEALTH_INTERVAL_SECONDS,
+                 reconnect_after=ELASTIC_RECONNECT_AFTER):
+        self.interval_seconds = interval_seconds
+        self.reconnect_after = reconnect_after
+        self._client = None
+        self._lock = threading.Lock()
+        self.connected = False
+        self.error = "Not checked yet"
+        self.last_check = None
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def get_client(self):
+        client = self._client
+        if client is not None:
+            return client
+        with self._lock:
+            if self._client is None:
+                try:
+                    self._client = build_client()
+                except Exception as e:
+                    self.error = str(e)
+                    return None
+            return self._client
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="elastic-health", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            client, self._client = self._client, None
+        _close_client(client)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval_seconds)
+
+    def check(self):
+        client = self.get_client()
+        try:
+            ok = client is not None and client.ping(request_timeout=ELASTIC_HEALTH_TIMEOUT)
+            error = None if ok else "Ping failed"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        self.connected = ok
+        self.error = error
+        self.last_check = time.time()
+
+        if ok:
+            if self.failures:
+                print("✅ Elasticsearch reconnected")
+            self.failures = 0
+            return
+
+        self.failures += 1
+        if self.failures % self.reconnect_after == 0:
+            print(f"⚠️ Elasticsearch unhealthy ({error}), rebuilding client")
+            self.reconnect()
+
+    def reconnect(self):
+        with self._lock:
+            old, self._client = self._client, None
+        if old is not None:
+            # Request thread / _source_pool bisa masih memegang client lama:
+            # request baru sudah memakai client baru, yang lama ditutup belakangan
+            timer = threading.Timer(ELASTIC_CLOSE_GRACE_SECONDS, _close_client, (old,))
+            timer.daemon = True
+            timer.start()
+        self.get_client()
+
+    def status(self):
+        return {
+            "connected": self.connected,
+            "host": ELASTIC_HOST,
+            "error": self.error,
+            "last_check": self.last_check,
+            "circuits": circuit_status()
+        }
+
+
+elastic_manager = ElasticClientManager()
+
+
+def get_es():
+    """Client Elasticsearch aktif (None kalau client gagal dibuat)."""
+    return elastic_manager.get_client()
 
 
 def get_elastic_status():
     """
     Helper untuk router
     """
-    return {
-        "connected": elastic_connected,
-        "host": ELASTIC_HOST,
-        "error": elastic_error
-    }
-
+    return elastic_manager.status()
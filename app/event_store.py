@@ -0,0 +1,185 @@
+# app/event_store.py
+import os
+import threading
+import time
+import traceback
+from collections import deque, defaultdict
+from datetime import datetime, timezone
+
+from .elastic_client import get_es
+from .tail import TailCursor
+from .timeframe import TIMEFRAME_ROUNDING, UNITS
+
+# Store ini menyimpan event N hari terakhir di memori → opt-in
+EVENT_STORE_ENABLED = os.getenv("EVENT_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+EVENT_STORE_DAYS = float(os.getenv("EVENT_STORE_DAYS", "1"))
+EVENT_STORE_MAX_EVENTS = int(os.getenv("EVENT_STORE_MAX_EVENTS", "200000"))
+EVENT_STORE_INTERVAL_SECONDS = float(os.getenv("EVENT_STORE_INTERVAL_SECONDS", "5"))
+
+# Kontrak yang sama dengan fetcher Elasticsearch
+SOURCE_FETCH_LIMIT = 500
+SURICATA_RULE_LIMIT = 500
+STORE_SOURCES = ["suricata", "sophos", "panw"]
+
+
+def _format_ms(ts_ms):
+    # Format value_as_string default Elasticsearch untuk min/max @timestamp
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts_ms % 1000:03d}Z"
+
+
+class SourceWindow:
+    """Event satu source, urut naik berdasarkan @timestamp, dibatasi umur & jumlah."""
+
+    def __init__(self, source, retention_ms, max_events):
+        self.source = source
+        self.retention_ms = retention_ms
+        self.events = deque(maxlen=max_events)
+        self.cursor = None
+        self.ready = False
+        self.lock = threading.Lock()
+
+    def covered_from_ms(self):
+        """Awal window yang dijamin lengkap di store."""
+        now_ms = int(time.time() * 1000)
+        start = now_ms - self.retention_ms
+        with self.lock:
+            if len(self.events) == self.events.maxlen:
+                # Event tertua sudah terbuang karena batas jumlah
+                start = max(start, self.events[0][0])
+        return start
+
+    def sync(self, es):
+        if self.cursor is None:
+            # Backfill awal: hanya max_events event terbaru dalam retention
+            # (yang lebih lama toh akan langsung terbuang oleh maxlen)
+            start_ms = int(time.time() * 1000) - self.retention_ms
+            self.cursor = TailCursor(self.source, start_ms=start_ms)
+            new_events = self.cursor.backfill(es, self.events.maxlen)
+        else:
+            new_events = self.cursor.fetch_new(es)
+
+        cutoff = int(time.time() * 1000) - self.retention_ms
+        with self.lock:
+            self.events.extend(new_events)
+            while self.events and self.events[0][0] < cutoff:
+                self.events.popleft()
+        self.ready = True
+
+    def newest(self, start_ms, limit):
+        """Event terbaru dalam window, maksimal limit, urut turun."""
+        result = []
+        with self.lock:
+            for ts_ms, event in reversed(self.events):
+                if ts_ms < start_ms or len(result) >= limit:
+                    break
+                result.append(event)
+        return result
+
+    def window(self, start_ms):
+        """Semua (ts_ms, event) sejak start_ms, urut naik."""
+        with self.lock:
+            result = []
+            for item in reversed(self.events):
+                if item[0] < start_ms:
+                    break
+                result.append(item)
+        result.reverse()
+        return result
+
+
+class RollingEventStore:
+    """
+    Store event ternormalisasi N hari terakhir per source.
+
+    Setelah backfill awal, tiap interval hanya delta sejak watermark
+    (TailCursor) yang diambil, lalu event yang melewati retention dibuang.
+    Request timeframe yang masih tercakup dijawab dengan slicing store,
+    sehingga trafik Elasticsearch menjadi O(event baru), bukan O(window).
+    """
+
+    def __init__(self, days=EVENT_STORE_DAYS, max_events=EVENT_STORE_MAX_EVENTS,
+                 interval_seconds=EVENT_STORE_INTERVAL_SECONDS):
+        # + satu satuan pembulatan timeframe: start window (mis. last24hours)
+        # di-floor ke menit sebelum now - N hari, tanpa margin tidak pernah tercakup
+        margin = UNITS.get(TIMEFRAME_ROUNDING, UNITS["m"])
+        retention_ms = int(days * 86400 * 1000 + margin.total_seconds() * 1000)
+        self.interval_seconds = interval_seconds
+        self.windows = {
+            source: SourceWindow(source, retention_ms, max_events)
+            for source in STORE_SOURCES
+        }
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rolling-event-store", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sync()
+            self._stop.wait(self.interval_seconds)
+
+    def sync(self):
+        es = get_es()
+        if es is None:
+            return
+        for window in self.windows.values():
+            try:
+                window.sync(es)
+            except Exception as e:
+                print("🔥 EVENT STORE ERROR:", window.source, e)
+                print(traceback.format_exc())
+
+    def covers(self, source, start_ms):
+        window = self.windows.get(source)
+        return (
+            self._thread is not None
+            and window is not None
+            and window.ready
+            and start_ms >= window.covered_from_ms()
+        )
+
+    def slice(self, source, start_ms):
+        """
+        Hasil setara fetcher Elasticsearch untuk window [start_ms, now]:
+        - sophos / panw : SOURCE_FETCH_LIMIT event terbaru
+        - suricata      : satu baris per rule (count, first/last event, sample terbaru)
+        """
+        window = self.windows[source]
+        if source != "suricata":
+            return window.newest(start_ms, SOURCE_FETCH_LIMIT)
+
+        rules = defaultdict(lambda: {"count": 0, "first": None, "last": None, "sample": None})
+        for ts_ms, event in window.window(start_ms):
+            r = rules[event.get("description")]
+            r["count"] += 1
+            if r["first"] is None:
+                r["first"] = ts_ms
+            r["last"] = ts_ms
+            r["sample"] = event
+
+        # Sama seperti terms agg: urut doc_count desc, lalu key
+        ordered = sorted(rules.items(), key=lambda kv: (-kv[1]["count"], str(kv[0])))
+        return [
+            r["sample"].replace(
+                count=r["count"],
+                first_event=_format_ms(r["first"]),
+                last_event=_format_ms(r["last"])
+            )
+            for _, r in ordered[:SURICATA_RULE_LIMIT]
+        ]
+
+    def timeline_events(self, source, start_ms):
+        """Semua event dalam window (untuk timeline yang akurat)."""
+        return [event for _, event in self.windows[source].window(start_ms)]
+
+
+event_store = RollingEventStore()
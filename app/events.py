@@ -0,0 +1,187 @@
+# app/events.py
+import heapq
+import sys
+from datetime import datetime
+from itertools import islice
+
+# Urutan field event ternormalisasi (sama dengan output fetcher sebelumnya)
+EVENT_FIELDS = (
+    "destination_ip",
+    "source_ip",
+    "country",
+    "event_type",
+    "sub_type",
+    "severity",
+    "timestamp",
+    "mitre_stages",
+    "event_id",
+    "application",
+    "description",
+    "protocol",
+    "destination_country",
+    "port",
+    "count",
+    "first_event",
+    "last_event",
+    "source_longitude",
+    "source_latitude",
+    "destination_longitude",
+    "destination_latitude",
+)
+
+# String yang berulang ribuan kali (source, severity, negara, rule, IP, ...)
+# di-intern supaya semua event berbagi satu objek string
+CATEGORICAL_FIELDS = frozenset((
+    "destination_ip",
+    "source_ip",
+    "country",
+    "event_type",
+    "sub_type",
+    "severity",
+    "mitre_stages",
+    "application",
+    "description",
+    "protocol",
+    "destination_country",
+))
+FLOAT_FIELDS = frozenset((
+    "source_longitude",
+    "source_latitude",
+    "destination_longitude",
+    "destination_latitude",
+))
+INT_FIELDS = frozenset(("port", "count"))
+
+_FIELD_SET = frozenset(EVENT_FIELDS)
+
+
+def _coerce(field, value):
+    if value is None:
+        return None
+    if field in CATEGORICAL_FIELDS:
+        return sys.intern(value) if isinstance(value, str) else value
+    if field in FLOAT_FIELDS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if field in INT_FIELDS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return value
+    return value
+
+
+def parse_timestamp_ms(ts):
+    """Timestamp ISO (dengan 'Z' / offset) → epoch ms, None kalau gagal."""
+    if not ts:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+    return int(dt.timestamp() * 1000)
+
+
+class Event:
+    """
+    Event ternormalisasi yang ringkas (__slots__, tanpa dict per event).
+
+    Bisa dibaca seperti dict (get / [] / keys) sehingga kode scoring,
+    timeline, MITRE dan filter tetap berjalan tanpa diubah, dan baru
+    diubah jadi dict di batas response (to_dict / dict(event)).
+    """
+
+    __slots__ = EVENT_FIELDS + ("_ts_ms",)
+
+    def __init__(self, **fields):
+        for field in EVENT_FIELDS:
+            setattr(self, field, _coerce(field, fields.get(field)))
+        self._ts_ms = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    @property
+    def ts_ms(self):
+        """@timestamp dalam epoch ms (di-parse sekali saat pertama dipakai)."""
+        if self._ts_ms is False:
+            self._ts_ms = parse_timestamp_ms(self.timestamp)
+        return self._ts_ms
+
+    def get(self, key, default=None):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def keys(self):
+        return EVENT_FIELDS
+
+    def __iter__(self):
+        return iter(EVENT_FIELDS)
+
+    def __len__(self):
+        return len(EVENT_FIELDS)
+
+    def __eq__(self, other):
+        if isinstance(other, Event):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def replace(self, **changes):
+        data = self.to_dict()
+        data.update(changes)
+        return Event(**data)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in EVENT_FIELDS}
+
+    def __repr__(self):
+        return f"Event({self.to_dict()!r})"
+
+
+
+def event_sort_key(event):
+    """Key urut @timestamp numerik; event tanpa timestamp valid paling lama."""
+    ts = event.ts_ms
+    return ts if ts is not None else -1
+
+
+def merge_newest(streams, limit=None, offset=0, predicate=None):
+    """
+    K-way merge (heap) beberapa stream event menjadi urutan @timestamp turun.
+    predicate (opsional) dievaluasi sambil merge, dan merge berhenti begitu
+    offset + limit event lolos, jadi tidak ada sort ulang seluruh gabungan.
+
+    heapq.merge butuh tiap stream urut dengan key yang sama. Urutan dari
+    Elasticsearch memakai @timestamp asli, sedangkan event tanpa timestamp
+    yang bisa di-parse mendapat key -1, jadi tiap stream diurutkan ulang
+    dulu dengan event_sort_key. Sort stabil pada stream yang sudah (hampir)
+    urut ≈ O(n), dan urutan asli event dengan key sama tetap terjaga, sama
+    seperti sorted(..., reverse=True) atas gabungan stream.
+    Return (events, has_more).
+    """
+    streams = [sorted(stream, key=event_sort_key, reverse=True) for stream in streams]
+    merged = heapq.merge(*streams, key=event_sort_key, reverse=True)
+    if predicate is not None:
+        merged = filter(predicate, merged)
+    if limit is None:
+        return list(islice(merged, offset, None)), False
+
+    # Ambil satu event ekstra untuk tahu masih ada halaman berikutnya
+    events = list(islice(merged, offset, offset + limit + 1))
+    return events[:limit], len(events) > limit
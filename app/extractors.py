@@ -0,0 +1,235 @@
+# app/extractors.py
+import sys
+
+from .events import Event, CATEGORICAL_FIELDS, FLOAT_FIELDS, INT_FIELDS, EVENT_FIELDS
+
+
+class Field:
+    """
+    Field ECS yang dibaca normalizer.
+
+    paths       : path ECS, path berikutnya = fallback (a or b or ...)
+    type        : tipe untuk filter pushdown ("ip", "keyword", "number"),
+                  None = tidak bisa di-pushdown
+    default     : nilai kalau semua path kosong
+    query_paths : path untuk query & agregasi (mis. .keyword). Field string
+                  di dynamic mapping bertipe text (dianalisis), jadi field
+                  "keyword" wajib menyebut sub-field .keyword-nya; tanpa itu
+                  mapping-nya dianggap tidak diketahui → tidak di-pushdown,
+                  filter Python yang menentukan. ip / number memakai paths.
+    """
+
+    def __init__(self, *paths, type=None, default=None, query_paths=None):
+        self.paths = list(paths)
+        self.type = type
+        self.default = default
+        if query_paths:
+            self.query_paths = list(query_paths)
+        elif type in ("ip", "number"):
+            self.query_paths = list(paths)
+        else:
+            self.query_paths = None
+
+
+class Const:
+    """Nilai tetap hasil normalizer (mis. event_type)."""
+
+    def __init__(self, value, type="const"):
+        self.value = value
+        self.type = type
+
+
+# ======================================================
+# MAPPING DEKLARATIF PER SOURCE
+# ======================================================
+
+COMMON_FIELDS = {
+    "destination_ip": Field("destination.ip", type="ip"),
+    "source_ip": Field("source.ip", type="ip"),
+    "country": Field("source.geo.country_name", type="keyword", query_paths=["source.geo.country_name.keyword"]),
+    "timestamp": Field("@timestamp"),
+    "mitre_stages": Field("mitre.stages", type="keyword", query_paths=["mitre.stages.keyword"]),
+    "protocol": Field("network.transport", type="keyword", query_paths=["network.transport.keyword"]),
+    "destination_country": Field(
+        "destination.geo.country_name", type="keyword", query_paths=["destination.geo.country_name.keyword"]
+    ),
+    "count": Const(1, type=None),
+    "first_event": Field("@timestamp"),
+    "last_event": Field("@timestamp"),
+    "source_longitude": Field("source.geo.location.lon"),
+    "source_latitude": Field("source.geo.location.lat"),
+    "destination_longitude": Field("destination.geo.location.lon"),
+    "destination_latitude": Field("destination.geo.location.lat"),
+}
+
+SOURCE_MAPPINGS = {
+    "suricata": dict(
+        COMMON_FIELDS,
+        event_type=Const("suricata"),
+        sub_type=Field("rule.category", type="keyword", query_paths=["rule.category.keyword"]),
+        severity=Field("event.severity_label", type="keyword", query_paths=["event.severity_label.keyword"]),
+        event_id=Field("log.id.uid", type="keyword", query_paths=["log.id.uid.keyword"]),
+        application=Const("application"),
+        description=Field("rule.name", type="keyword", query_paths=["rule.name.keyword"]),
+        port=Field("destination.port", type="number"),
+    ),
+    "sophos": dict(
+        COMMON_FIELDS,
+        event_type=Const("sophos"),
+        sub_type=Field("sophos.xg.log_type", type="keyword", query_paths=["sophos.xg.log_type.keyword"]),
+        severity=Field(
+            "event.severity_label", "log.level", type="keyword",
+            query_paths=["event.severity_label.keyword", "log.level.keyword"]
+        ),
+        event_id=Field("log.id.uid", type="keyword", query_paths=["log.id.uid.keyword"]),
+        application=Field("sophos.xg.app_name", type="keyword", query_paths=["sophos.xg.app_name.keyword"]),
+        description=Field(
+            "sophos.xg.message", "sophos.xg.rule_name", type="keyword", default="unknown",
+            query_paths=["sophos.xg.message.keyword", "sophos.xg.rule_name.keyword"]
+        ),
+        port=Field("destination.port", "sophos.xg.dst_port", type="number"),
+    ),
+    "panw": dict(
+        COMMON_FIELDS,
+        event_type=Const("panw"),
+        sub_type=Field("panw.panos.sub_type", type="keyword", query_paths=["panw.panos.sub_type.keyword"]),
+        severity=Field("log.syslog.severity.name", type="keyword", query_paths=["log.syslog.severity.name.keyword"]),
+        # seqno bisa ter-mapping numerik → mapping tidak pasti, cukup filter Python
+        event_id=Field("panw.panos.seqno", type="keyword"),
+        application=Field("panw.panos.app", type="keyword", query_paths=["panw.panos.app.keyword"]),
+        description=Field("panw.panos.threat.name", type="keyword", query_paths=["panw.panos.threat.name.keyword"]),
+        port=Field("destination.port", "panw.panos.dest_port", type="number"),
+    ),
+}
+
+
+# ======================================================
+# COMPILER: mapping → fungsi normalizer
+# ======================================================
+
+_EMPTY = {}
+
+
+def _intern(value):
+    return sys.intern(value) if value.__class__ is str else value
+
+
+def _float(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _path_expr(path):
+    # "a.b.c" → src.get('a', _EMPTY).get('b', _EMPTY).get('c')
+    keys = path.split(".")
+    expr = "src"
+    for key in keys[:-1]:
+        expr += f".get({key!r}, _EMPTY)"
+    return expr + f".get({keys[-1]!r})"
+
+
+def compile_normalizer(mapping, name="normalize"):
+    """
+    Compile mapping deklaratif sekali menjadi satu fungsi Python
+    normalize(src, overrides=None) → Event.
+
+    Semua chain .get() dan fallback ditulis langsung di body fungsi
+    (tanpa loop / lookup mapping per hit), dan koersi tipe mengikuti Event.
+    """
+    namespace = {
+        "_EMPTY": _EMPTY,
+        "_Event": Event,
+        "_new": object.__new__,
+        "_intern": _intern,
+        "_float": _float,
+        "_int": _int,
+    }
+    lines = [f"def {name}(src, overrides=None):", "    e = _new(_Event)"]
+
+    for i, field in enumerate(EVENT_FIELDS):
+        spec = mapping[field]
+        if isinstance(spec, Const):
+            const_name = f"_const{i}"
+            namespace[const_name] = _intern(spec.value)
+            lines.append(f"    e.{field} = {const_name}")
+            continue
+
+        expr = " or ".join(_path_expr(p) for p in spec.paths)
+        if spec.default is not None:
+            default_name = f"_default{i}"
+            namespace[default_name] = spec.default
+            expr = f"{expr} or {default_name}"
+        elif len(spec.paths) > 1:
+            # `a or b` mengembalikan b (bisa None) kalau a kosong, sama seperti aslinya
+            expr = f"({expr})"
+
+        if field in CATEGORICAL_FIELDS:
+            expr = f"_intern({expr})"
+        elif field in FLOAT_FIELDS:
+            expr = f"_float({expr})"
+        elif field in INT_FIELDS:
+            expr = f"_int({expr})"
+        lines.append(f"    e.{field} = {expr}")
+
+    lines += [
+        "    e._ts_ms = False",
+        "    if overrides:",
+        "        for key, value in overrides.items():",
+        "            setattr(e, key, value)",
+        "    return e",
+    ]
+
+    exec(compile("\n".join(lines), f"<normalizer {name}>", "exec"), namespace)
+    return namespace[name]
+
+
+def source_fields(mapping):
+    """Semua path _source yang dibaca normalizer (untuk _source includes)."""
+    fields = []
+    for spec in mapping.values():
+        if isinstance(spec, Field):
+            for path in spec.paths:
+                if path not in fields:
+                    fields.append(path)
+    return fields
+
+
+def build_field_map(mappings):
+    """
+    Turunkan SOURCE_FIELD_MAP (dipakai filter pushdown & risk aggregation)
+    dari mapping deklaratif, jadi satu field cukup didefinisikan sekali.
+    """
+    field_map = {}
+    for source, mapping in mappings.items():
+        fields = {}
+        for name, spec in mapping.items():
+            if spec.type is None or getattr(spec, "query_paths", ()) is None:
+                continue
+            if isinstance(spec, Const):
+                fields[name] = {"type": "const", "value": spec.value}
+                continue
+            entry = {"type": spec.type, "paths": spec.query_paths}
+            if spec.default is not None:
+                entry["default"] = spec.default
+            fields[name] = entry
+        field_map[source] = fields
+    return field_map
+
+
+NORMALIZERS = {
+    source: compile_normalizer(mapping, f"normalize_{source}_hit")
+    for source, mapping in SOURCE_MAPPINGS.items()
+}
@@ -0,0 +1,211 @@
+# app/index_resolver.py
+import os
+import re
+import threading
+import time
+
+from .elastic_client import ELASTIC_AGG_TIMEOUT, get_es
+
+INDEX_PRUNING_ENABLED = os.getenv("INDEX_PRUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+# Daftar backing index dicek tiap interval ini (deteksi rollover, murah: _cat/indices)
+INDEX_LIST_INTERVAL_SECONDS = float(os.getenv("INDEX_LIST_INTERVAL_SECONDS", "30"))
+# Rentang @timestamp semua backing index dihitung ulang tiap interval ini
+# (menangkap dokumen telat / index yang dihapus ILM)
+INDEX_RANGES_REFRESH_SECONDS = float(os.getenv("INDEX_RANGES_REFRESH_SECONDS", "3600"))
+
+# .ds-<data stream>-<yyyy.MM.dd>-<generation>
+_BACKING_INDEX = re.compile(r"^\.ds-(?P<stream>.+)-\d{4}\.\d{2}\.\d{2}-(?P<generation>\d+)$")
+_EMPTY = (None, None)
+
+
+class _PatternState:
+    __slots__ = ("indices", "ranges", "write", "ranges_at")
+
+    def __init__(self, indices=(), ranges=None, write=(), ranges_at=None):
+        self.indices = tuple(indices)      # semua index yang cocok dengan pola
+        self.ranges = ranges or {}         # index → (min_ms, max_ms) / _EMPTY
+        self.write = frozenset(write)      # write index tiap data stream (selalu di-query)
+        self.ranges_at = ranges_at
+
+
+def write_indices(indices):
+    """
+    Write index = generation tertinggi per data stream. Index yang bukan
+    backing index data stream ikut dianggap bisa berubah (selalu di-query).
+    """
+    latest = {}
+    mutable = set()
+    for name in indices:
+        match = _BACKING_INDEX.match(name)
+        if match is None:
+            mutable.add(name)
+            continue
+        stream, generation = match.group("stream"), int(match.group("generation"))
+        if stream not in latest or generation > latest[stream][0]:
+            latest[stream] = (generation, name)
+    return mutable | {name for _, name in latest.values()}
+
+
+class BackingIndexResolver:
+    """
+    Persempit pola index (mis. .ds-logs-panw.panos-default-*) menjadi backing
+    index yang rentang @timestamp-nya overlap dengan window query.
+
+    - Write index (generation terbaru tiap data stream) masih menerima dokumen,
+      jadi selalu ikut di-query.
+    - Backing index lain sudah read-only setelah rollover; min/max @timestamp
+      dihitung sekali (terms _index + min/max) lalu di-cache.
+    - Background thread mengecek daftar index tiap INDEX_LIST_INTERVAL_SECONDS;
+      index baru / index yang baru di-rollover langsung dihitung rentangnya.
+
+    Hasil resolve() adalah pola asli dikurangi (-index) backing index lama
+    yang tidak overlap window, bukan daftar eksplisit: generation baru hasil
+    rollover di antara dua refresh tetap cocok dengan wildcard-nya, jadi
+    dokumen terbaru tidak pernah terlewat. Selama pola belum pernah
+    di-refresh (atau refresh gagal) / bukan wildcard, pola asli dipakai apa adanya.
+    """
+
+    def __init__(self, list_interval=INDEX_LIST_INTERVAL_SECONDS, ranges_interval=INDEX_RANGES_REFRESH_SECONDS):
+        self.list_interval = list_interval
+        self.ranges_interval = ranges_interval
+        self._states = {}
+        self._patterns = set()
+        self._error = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="index-resolver", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pattern in list(self._patterns):
+                self.refresh(pattern)
+            self._wake.wait(self.list_interval)
+            self._wake.clear()
+
+    # ---------------- refresh ----------------
+
+    def _list_indices(self, es, pattern):
+        rows = es.cat.indices(index=pattern, h="index", format="json", expand_wildcards="open,hidden")
+        return sorted(row["index"] for row in rows)
+
+    def _fetch_ranges(self, es, indices):
+        res = es.search(
+            index=",".join(indices),
+            body={
+                "size": 0,
+                "aggs": {
+                    "by_index": {
+                        "terms": {"field": "_index", "size": len(indices)},
+                        "aggs": {
+                            "min_ts": {"min": {"field": "@timestamp"}},
+                            "max_ts": {"max": {"field": "@timestamp"}}
+                        }
+                    }
+                }
+            },
+            filter_path=[
+                "aggregations.by_index.buckets.key",
+                "aggregations.by_index.buckets.min_ts.value",
+                "aggregations.by_index.buckets.max_ts.value"
+            ],
+            request_timeout=ELASTIC_AGG_TIMEOUT,
+            ignore_unavailable=True
+        )
+        ranges = {name: _EMPTY for name in indices}
+        for bucket in (res.get("aggregations") or {}).get("by_index", {}).get("buckets", []):
+            low, high = bucket.get("min_ts", {}).get("value"), bucket.get("max_ts", {}).get("value")
+            if low is not None and high is not None:
+                ranges[bucket["key"]] = (int(low), int(high))
+        return ranges
+
+    def refresh(self, pattern):
+        es = get_es()
+        if es is None:
+            return
+
+        try:
+            indices = self._list_indices(es, pattern)
+            write = write_indices(indices)
+            old = self._states.get(pattern) or _PatternState()
+            now = time.monotonic()
+
+            full = old.ranges_at is None or now - old.ranges_at >= self.ranges_interval
+            ranges = {} if full else {name: r for name, r in old.ranges.items() if name in indices}
+            # Index read-only yang belum punya rentang: baru muncul / baru saja di-rollover
+            missing = [name for name in indices if name not in write and name not in ranges]
+            if missing:
+                ranges.update(self._fetch_ranges(es, missing))
+        except Exception as e:
+            # Pakai state lama (atau pola asli) sampai refresh berikutnya berhasil
+            self._error = str(e)
+            return
+
+        # Ganti state sekaligus (atomic) supaya resolve() tidak perlu lock
+        self._states[pattern] = _PatternState(indices, ranges, write, now if full else old.ranges_at)
+        self._error = None
+
+    # ---------------- resolve ----------------
+
+    def resolve(self, pattern, start_ms, end_ms):
+        """Ekspresi index (pola,-index,...) yang perlu di-query untuk window [start_ms, end_ms]."""
+        if not INDEX_PRUNING_ENABLED or not pattern:
+            return pattern
+        # Exclusion (-index) hanya berlaku setelah ekspresi wildcard
+        if "*" not in pattern:
+            return pattern
+
+        state = self._states.get(pattern)
+        if state is None:
+            if pattern not in self._patterns:
+                self._patterns.add(pattern)
+                self._wake.set()
+            return pattern
+        if not state.indices:
+            return pattern
+
+        excluded = []
+        for name in state.indices:
+            if name in state.write:
+                continue
+            low, high = state.ranges.get(name, (start_ms, end_ms))
+            if low is None or low > end_ms or high < start_ms:
+                excluded.append(name)
+
+        if not excluded:
+            return pattern
+        return ",".join([pattern] + ["-" + name for name in excluded])
+
+    def search_params(self, pattern, start_ms, end_ms):
+        """
+        kwargs index untuk es.search / count / open_point_in_time. Ekspresi hasil
+        pruning memakai ignore_unavailable: index yang di-exclude bisa saja
+        dihapus ILM sebelum refresh berikutnya.
+        """
+        index = self.resolve(pattern, start_ms, end_ms)
+        if index == pattern:
+            return {"index": pattern}
+        return {"index": index, "ignore_unavailable": True}
+
+    def status(self):
+        return {
+            pattern: {
+                "indices": len(state.indices),
+                "write": sorted(state.write),
+                "ranges_age_seconds": round(time.monotonic() - state.ranges_at, 1) if state.ranges_at is not None else None
+            }
+            for pattern, state in list(self._states.items())
+        } | {"error": self._error}
+
+
+index_resolver = BackingIndexResolver()
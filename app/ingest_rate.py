@@ -0,0 +1,108 @@
+# app/ingest_rate.py
+import os
+import threading
+import time
+
+from .elastic_client import get_es
+from .index_resolver import index_resolver
+from .services import INDEX, INDEX_PANW, SOURCE_FILTERS
+
+# Rate = jumlah event dalam window terakhir / panjang window (event per detik)
+INGEST_RATE_WINDOW_SECONDS = int(os.getenv("INGEST_RATE_WINDOW_SECONDS", "60"))
+INGEST_RATE_INTERVAL_SECONDS = float(os.getenv("INGEST_RATE_INTERVAL_SECONDS", "5"))
+
+RATE_SOURCES = [
+    ("suricata", INDEX),
+    ("sophos", INDEX),
+    ("panw", INDEX_PANW),
+]
+
+
+class IngestRateSampler:
+    """
+    Sampler background untuk ingest rate per source.
+
+    Setiap interval menjalankan _count (murah, tanpa dokumen) per source
+    untuk window terakhir, lalu menyimpan hasilnya sehingga pembacaan rate
+    dari endpoint cukup O(1).
+    """
+
+    def __init__(self, window_seconds=INGEST_RATE_WINDOW_SECONDS, interval_seconds=INGEST_RATE_INTERVAL_SECONDS):
+        self.window_seconds = window_seconds
+        self.interval_seconds = interval_seconds
+        self._rates = {}
+        self._updated_at = None
+        self._error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ingest-rate-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval_seconds)
+
+    def _count(self, es, source, index):
+        query = {
+            "query": {
+                "bool": {
+                    "filter": [
+                        {"range": {"@timestamp": {
+                            "gte": f"now-{self.window_seconds}s",
+                            "lte": "now"
+                        }}}
+                    ] + SOURCE_FILTERS[source]
+                }
+            }
+        }
+        # Window pendek → biasanya cukup write index saja
+        now_ms = int(time.time() * 1000)
+        params = index_resolver.search_params(index, now_ms - self.window_seconds * 1000, now_ms)
+        return es.count(body=query, **params)["count"]
+
+    def sample(self):
+        es = get_es()
+        if es is None:
+            self._error = "Elasticsearch not connected"
+            return
+
+        try:
+            rates = {
+                source: round(self._count(es, source, index) / self.window_seconds, 2)
+                for source, index in RATE_SOURCES
+            }
+        except Exception as e:
+            # Simpan rate terakhir, cukup catat error-nya
+            self._error = str(e)
+            return
+
+        # Ganti dict sekaligus (atomic) supaya pembaca tidak perlu lock
+        self._rates = rates
+        self._updated_at = time.time()
+        self._error = None
+
+    def get_total_rate(self):
+        return round(sum(self._rates.values()), 2)
+
+    def get_rates(self):
+        updated_at = self._updated_at
+        return {
+            "window_seconds": self.window_seconds,
+            "total": self.get_total_rate(),
+            "sources": dict(self._rates),
+            "updated_at": updated_at,
+            "age_seconds": round(time.time() - updated_at, 2) if updated_at else None,
+            "error": self._error
+        }
+
+
+ingest_rate_sampler = IngestRateSampler()
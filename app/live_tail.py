@@ -0,0 +1,86 @@
+# app/live_tail.py
+import asyncio
+import os
+import traceback
+
+from .elastic_client import get_es
+from .ingest_rate import ingest_rate_sampler
+from .tail import TailCursor
+
+LIVE_TAIL_INTERVAL_SECONDS = float(os.getenv("LIVE_TAIL_INTERVAL_SECONDS", "2"))
+LIVE_QUEUE_SIZE = 100
+LIVE_SOURCES = ["suricata", "sophos", "panw"]
+
+
+class LiveEventHub:
+    """
+    Satu tail poller untuk semua koneksi WebSocket.
+
+    Poller hanya berjalan selama ada subscriber. Setiap tick, satu query
+    incremental per source (sejak watermark) dijalankan, lalu event baru
+    di-broadcast ke queue masing-masing client.
+    """
+
+    def __init__(self, interval_seconds=LIVE_TAIL_INTERVAL_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._subscribers = set()
+        self._task = None
+        self._cursors = {}
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            # Mulai dari "sekarang": client baru hanya menerima event baru
+            self._cursors = {source: TailCursor(source) for source in LIVE_SOURCES}
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _poll(self):
+        es = get_es()
+        if es is None:
+            return {}
+        return {
+            source: [event for _, event in cursor.fetch_new(es)]
+            for source, cursor in self._cursors.items()
+        }
+
+    async def _run(self):
+        while self._subscribers:
+            try:
+                new_events = await asyncio.to_thread(self._poll)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print("🔥 LIVE TAIL ERROR:", e)
+                print(traceback.format_exc())
+                new_events = {}
+
+            if any(new_events.values()):
+                self._broadcast({
+                    "type": "events",
+                    "counts": {source: len(events) for source, events in new_events.items()},
+                    "rate": ingest_rate_sampler.get_total_rate(),
+                    "events": new_events
+                })
+
+            await asyncio.sleep(self.interval_seconds)
+
+    def _broadcast(self, message):
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Client lambat: buang pesan paling lama, jangan blok poller
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(message)
+
+
+live_event_hub = LiveEventHub()
@@ -0,0 +1,121 @@
+# app/materializer.py
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from .elastic_client import get_es
+from .services import build_summary
+
+# Timeframe yang di-precompute → interval refresh (detik).
+# Window pendek berubah cepat, window panjang cukup jarang di-refresh.
+MATERIALIZED_TIMEFRAMES = {
+    "today": 15,
+    "last1hours": 15,
+    "last24hours": 60,
+    "last7days": 300,
+    "last30days": 900,
+}
+
+MATERIALIZER_ENABLED = os.getenv("MATERIALIZER_ENABLED", "true").lower() in ("1", "true", "yes")
+MATERIALIZER_TICK_SECONDS = 1.0
+# Snapshot dianggap basi kalau lebih tua dari N x interval refresh-nya
+MATERIALIZER_STALE_FACTOR = 2
+# Jumlah timeframe (termasuk yang tidak dijadwalkan) yang disimpan sebagai last-known-good
+SUMMARY_LAST_GOOD_MAX = 32
+
+
+class SummaryMaterializer:
+    """
+    Scheduler background yang menghitung ulang build_summary() untuk setiap
+    timeframe di MATERIALIZED_TIMEFRAMES sesuai jadwalnya masing-masing.
+
+    /events/summary cukup membaca snapshot terakhir dari memori, sehingga
+    beban Elasticsearch ditentukan jadwal refresh, bukan jumlah user.
+    """
+
+    def __init__(self, schedule=MATERIALIZED_TIMEFRAMES):
+        self.schedule = dict(schedule)
+        self._snapshots = {}
+        self._last_good = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_run = {timeframe: 0.0 for timeframe in self.schedule}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="summary-materializer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            # Jalankan yang paling lama jatuh tempo dulu
+            due = sorted(
+                (t for t, next_run in self._next_run.items() if next_run <= now),
+                key=lambda t: self._next_run[t]
+            )
+            for timeframe in due:
+                if self._stop.is_set():
+                    break
+                self.refresh(timeframe)
+            self._stop.wait(MATERIALIZER_TICK_SECONDS)
+
+    def refresh(self, timeframe):
+        interval = self.schedule.get(timeframe)
+        try:
+            es = get_es()
+            if es is None:
+                return None
+            payload = build_summary(es, timeframe)
+            self.store(timeframe, payload)
+            return payload
+        except Exception as e:
+            print("🔥 MATERIALIZER ERROR:", timeframe, e)
+            print(traceback.format_exc())
+            return None
+        finally:
+            if interval:
+                self._next_run[timeframe] = time.monotonic() + interval
+
+    def store(self, timeframe, payload):
+        snapshot = (payload, time.time())
+        if timeframe in self.schedule:
+            self._snapshots[timeframe] = snapshot
+        with self._lock:
+            self._last_good[timeframe] = snapshot
+            self._last_good.move_to_end(timeframe)
+            while len(self._last_good) > SUMMARY_LAST_GOOD_MAX:
+                self._last_good.popitem(last=False)
+
+    def get_snapshot(self, timeframe):
+        """Return (payload, umur_detik) atau None kalau belum ada."""
+        snapshot = self._snapshots.get(timeframe)
+        if snapshot is None:
+            return None
+        payload, built_at = snapshot
+        return payload, round(time.time() - built_at, 2)
+
+    def last_good(self, timeframe):
+        """Hasil sukses terakhir untuk timeframe apa pun: (payload, umur_detik) atau None."""
+        with self._lock:
+            snapshot = self._last_good.get(timeframe)
+        if snapshot is None:
+            return None
+        payload, built_at = snapshot
+        return payload, round(time.time() - built_at, 2)
+
+    def is_overdue(self, timeframe, age):
+        """True kalau refresh terjadwal sudah beberapa kali gagal (snapshot basi)."""
+        interval = self.schedule.get(timeframe)
+        return interval is not None and age > interval * MATERIALIZER_STALE_FACTOR
+
+
+summary_materializer = SummaryMaterializer()
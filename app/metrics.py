@@ -0,0 +1,112 @@
+# app/metrics.py
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+from .profiling import record_timing
+
+# ======================================================
+# METRIK PROMETHEUS (di-scrape dari GET /metrics)
+# ======================================================
+
+# Bucket latency: 1 ms .. 30 s
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+# Bucket ukuran payload: 1 KiB .. 256 MiB
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+ES_SEARCH_SECONDS = Histogram(
+    "threat_api_es_search_seconds",
+    "Durasi es.search di sisi client (termasuk network & parse response)",
+    ["source", "timeframe"], buckets=LATENCY_BUCKETS
+)
+ES_TOOK_SECONDS = Histogram(
+    "threat_api_es_took_seconds",
+    "Durasi eksekusi query menurut Elasticsearch (field took)",
+    ["source", "timeframe"], buckets=LATENCY_BUCKETS
+)
+ES_SEARCH_ERRORS = Counter(
+    "threat_api_es_search_errors_total",
+    "es.search yang melempar error",
+    ["source"]
+)
+STAGE_SECONDS = Histogram(
+    "threat_api_stage_seconds",
+    "Durasi tahap pipeline (normalisasi, scoring, timeline, encoding, ...)",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+CACHE_REQUESTS = Counter(
+    "threat_api_cache_requests_total",
+    "Lookup cache hasil fetch per hasil (hit, miss, coalesced, stale)",
+    ["cache", "result"]
+)
+CACHE_PAYLOAD_BYTES = Histogram(
+    "threat_api_cache_payload_bytes",
+    "Perkiraan ukuran hasil fetch yang disimpan ke cache",
+    ["cache"], buckets=SIZE_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "threat_api_response_bytes",
+    "Ukuran body response JSON",
+    buckets=SIZE_BUCKETS
+)
+
+# Timeframe berasal dari request → label dibatasi ke bentuk yang dikenal
+# supaya input bebas tidak membuat time series baru tanpa batas
+_TIMEFRAME_LABEL = re.compile(r"(last)?\d{1,3}(seconds|minutes|hours|days)|today|yesterday|tail")
+
+
+def timeframe_label(timeframe):
+    return timeframe if timeframe and _TIMEFRAME_LABEL.fullmatch(timeframe) else "other"
+
+
+def timed_search(es, source, timeframe, **kwargs):
+    """
+    es.search(**kwargs) + histogram waktu client & took Elasticsearch.
+    filter_path harus menyertakan "took" supaya took ikut tercatat.
+    """
+    labels = (source, timeframe_label(timeframe))
+    start = time.perf_counter()
+    try:
+        res = es.search(**kwargs)
+    except Exception:
+        ES_SEARCH_ERRORS.labels(source).inc()
+        raise
+    elapsed = time.perf_counter() - start
+    ES_SEARCH_SECONDS.labels(*labels).observe(elapsed)
+
+    took = res.get("took")
+    if took is not None:
+        ES_TOOK_SECONDS.labels(*labels).observe(took / 1000)
+    record_timing(f"es_{source}", elapsed, f"took={took}ms" if took is not None else None)
+    return res
+
+
+@contextmanager
+def stage(name):
+    """Catat durasi blok kode sebagai satu tahap pipeline (+ Server-Timing kalau diprofil)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        record_timing(name, elapsed)
+
+
+def timed_stage(name):
+    """Decorator versi stage()."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    """Return (body, content_type) untuk endpoint /metrics."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,298 @@
+# app/pagination.py
+import base64
+import hashlib
+import heapq
+import json
+import os
+
+from elasticsearch.exceptions import TransportError
+
+from .cache import cached_fetch
+from .index_resolver import index_resolver
+from .metrics import timed_search
+from .timeframe import is_absolute_timeframe, resolve_timeframe
+from .services import (
+    INDEX,
+    INDEX_PANW,
+    SOURCE_FILTERS,
+    SOURCE_INCLUDES,
+    get_suricata_events,
+    normalize_sophos_hit,
+    normalize_panw_hit,
+    safe_parse_timestamp,
+    _source_pool,
+)
+
+PIT_KEEP_ALIVE = os.getenv("PIT_KEEP_ALIVE", "2m")
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+# Batas putaran fetch per halaman kalau filter Python banyak membuang event,
+# supaya satu request tidak menyisir seluruh index
+MAX_ROUNDS_PER_PAGE = 10
+
+# Source berbasis dokumen mentah (bisa PIT + search_after)
+DOC_SOURCES = {
+    "sophos": (INDEX, normalize_sophos_hit),
+    "panw": (INDEX_PANW, normalize_panw_hit),
+}
+SOURCES = ["suricata", "sophos", "panw"]
+PAGE_FILTER_PATH = ["took", "pit_id", "hits.hits._source", "hits.hits.sort"]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(InvalidCursor):
+    """PIT di cursor sudah kadaluarsa (lebih dari PIT_KEEP_ALIVE sejak halaman terakhir)."""
+
+
+def encode_cursor(state):
+    raw = json.dumps(state, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _validate_state(state):
+    if not isinstance(state, dict):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(state.get("timeframe"), str):
+        raise InvalidCursor("Invalid cursor: timeframe")
+    if not is_absolute_timeframe(state.get("window")):
+        raise InvalidCursor("Invalid cursor: window")
+    if state.get("filters") is not None and not isinstance(state["filters"], str):
+        raise InvalidCursor("Invalid cursor: filters")
+
+    sources = state.get("sources")
+    if not isinstance(sources, dict) or set(sources) != set(SOURCES):
+        raise InvalidCursor("Invalid cursor: sources")
+    for source, source_state in sources.items():
+        if not isinstance(source_state, dict) or not isinstance(source_state.get("done"), bool):
+            raise InvalidCursor(f"Invalid cursor: {source}")
+        after = source_state.get("after")
+        if after is not None and not (isinstance(after, list) and after):
+            raise InvalidCursor(f"Invalid cursor: {source}.after")
+        if source in DOC_SOURCES and not source_state["done"] and not isinstance(source_state.get("pit"), str):
+            raise InvalidCursor(f"Invalid cursor: {source}.pit")
+
+
+def decode_cursor(cursor):
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    _validate_state(state)
+    return state
+
+
+def filters_digest(filters, logic, search_query):
+    """
+    Hash payload filter (filters, operator_logic, search_query). Disimpan di
+    cursor: posisi search_after hanya berlaku untuk hasil filter yang sama.
+    """
+    payload = {
+        "filters": [[f.field, f.operator, f.value] for f in filters or []],
+        "logic": logic,
+        "search_query": search_query
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _is_context_missing(error):
+    # PIT kadaluarsa: 404 search_context_missing_exception (bisa juga sebagai root_cause)
+    return "search_context_missing_exception" in f"{error.error} {error.info}"
+
+
+def _timestamp_ms(value):
+    ts = safe_parse_timestamp(value)
+    return int(ts.timestamp() * 1000) if ts else 0
+
+
+def new_state(es, timeframe, extra_filters, filters_key=None):
+    """
+    State awal pagination. Rentang waktu dibekukan di cursor supaya
+    halaman berikutnya membaca window yang sama.
+    extra_filters: {source: list clause | None (source di-skip)}
+    filters_key: filters_digest() payload filter, dicek ulang di tiap halaman
+    """
+    window = resolve_timeframe(timeframe)
+    state = {
+        "timeframe": timeframe,
+        "filters": filters_key,
+        # Window absolut "<start_ms>..<end_ms>": tidak bergeser antar halaman,
+        # dipakai query dokumen maupun agregasi Suricata
+        "window": window.absolute_timeframe,
+        "sources": {}
+    }
+
+    for source in SOURCES:
+        skip = extra_filters.get(source) is None
+        source_state = {"after": None, "done": skip}
+
+        if source in DOC_SOURCES and not skip:
+            index, _ = DOC_SOURCES[source]
+            pit = es.open_point_in_time(keep_alive=PIT_KEEP_ALIVE, **index_resolver.search_params(
+                index, window.start_ms, window.end_ms
+            ))
+            source_state["pit"] = pit["id"]
+
+        state["sources"][source] = source_state
+
+    return state
+
+
+def close_state(es, state):
+    for source_state in state["sources"].values():
+        _close_pit(es, source_state)
+
+
+def _close_pit(es, source_state):
+    pit = source_state.pop("pit", None)
+    if not pit:
+        return
+    try:
+        es.close_point_in_time(body={"id": pit})
+    except Exception:
+        # PIT tetap akan kadaluarsa sendiri setelah keep_alive
+        pass
+
+
+def _fetch_doc_rows(es, source, timeframe, state, extra_filters, size):
+    source_state = state["sources"][source]
+    _, normalize = DOC_SOURCES[source]
+
+    query = {
+        "size": size,
+        "query": {
+            "bool": {
+                "filter": [
+                    resolve_timeframe(state["window"]).range_filter(absolute=True)
+                ] + SOURCE_FILTERS[source] + (extra_filters or [])
+            }
+        },
+        "_source": SOURCE_INCLUDES[source],
+        "pit": {"id": source_state["pit"], "keep_alive": PIT_KEEP_ALIVE},
+        "sort": [
+            {"@timestamp": {"order": "desc"}},
+            {"_shard_doc": {"order": "desc"}}
+        ],
+        "track_total_hits": False
+    }
+    if source_state["after"]:
+        query["search_after"] = source_state["after"]
+
+    try:
+        res = timed_search(es, source, timeframe, body=query, filter_path=PAGE_FILTER_PATH)
+    except TransportError as e:
+        if _is_context_missing(e):
+            raise CursorExpired("Cursor expired, restart paging without cursor") from e
+        raise
+    # PIT id bisa berubah di setiap response
+    source_state["pit"] = res.get("pit_id", source_state["pit"])
+
+    return [
+        (h["sort"][0], h["sort"], normalize(h.get("_source", {})))
+        for h in res.get("hits", {}).get("hits", [])
+    ]
+
+
+def _fetch_suricata_rows(es, timeframe, state, extra_filters, size):
+    # Suricata sudah berupa agregasi per rule (jumlahnya terbatas), jadi
+    # dipaging di Python dengan key (timestamp, rule) dari hasil yang di-cache.
+    # Agregasi memakai window beku dari cursor, bukan timeframe relatif,
+    # supaya baris tidak bergeser / berulang antar halaman.
+    rows = cached_fetch("suricata", get_suricata_events, es, INDEX, state["window"], extra_filters)
+    after = state["sources"]["suricata"]["after"]
+
+    keyed = sorted(
+        ((_timestamp_ms(r.get("timestamp")), r.get("description") or "", r) for r in rows),
+        key=lambda x: (x[0], x[1]),
+        reverse=True
+    )
+    if after:
+        after = tuple(after)
+        keyed = [k for k in keyed if (k[0], k[1]) < after]
+
+    return [(ts, [ts, desc], r) for ts, desc, r in keyed[:size]]
+
+
+def _fetch_rows(es, source, timeframe, state, extra_filters, size):
+    if source == "suricata":
+        return _fetch_suricata_rows(es, timeframe, state, extra_filters, size)
+    return _fetch_doc_rows(es, source, timeframe, state, extra_filters, size)
+
+
+def fetch_page(es, timeframe, extra_filters, page_size=PAGE_SIZE_DEFAULT, state=None, predicate=None,
+               filters_key=None):
+    """
+    Ambil satu halaman event dari semua source, terurut @timestamp desc.
+
+    Tiap source maju dengan cursor search_after-nya sendiri; baris yang
+    tidak terpakai di halaman ini akan diambil ulang di halaman berikutnya.
+    predicate (opsional) = filter presisi di Python.
+    filters_key (opsional) = disimpan di state baru (lihat filters_digest).
+
+    Return (events, state). state["sources"][*]["done"] semua True
+    berarti data sudah habis.
+    """
+    page_size = max(1, min(page_size or PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX))
+    if state is None:
+        state = new_state(es, timeframe, extra_filters, filters_key)
+
+    page = []
+    rounds = 0
+
+    while len(page) < page_size and rounds < MAX_ROUNDS_PER_PAGE:
+        active = [s for s in SOURCES if not state["sources"][s]["done"]]
+        if not active:
+            break
+        rounds += 1
+        need = page_size - len(page)
+
+        futures = {
+            source: _source_pool.submit(
+                _fetch_rows, es, source, timeframe, state, extra_filters.get(source), need
+            )
+            for source in active
+        }
+        fetched = {source: f.result() for source, f in futures.items()}
+
+        tagged = [
+            [(ts, sort, row, source) for ts, sort, row in rows]
+            for source, rows in fetched.items()
+        ]
+        merged = heapq.merge(*tagged, key=lambda x: x[0], reverse=True)
+
+        consumed = {source: 0 for source in active}
+        for _, (ts, sort, row, source) in zip(range(need), merged):
+            state["sources"][source]["after"] = sort
+            consumed[source] += 1
+            if predicate is None or predicate(row):
+                page.append(row)
+
+        for source, rows in fetched.items():
+            # Semua baris terpakai dan kurang dari yang diminta → source habis
+            if consumed[source] == len(rows) and len(rows) < need:
+                state["sources"][source]["done"] = True
+                _close_pit(es, state["sources"][source])
+
+    return page, state
+
+
+def is_exhausted(state):
+    return all(s["done"] for s in state["sources"].values())
+
+
+def iter_pages(es, timeframe, extra_filters, page_size=PAGE_SIZE_DEFAULT, predicate=None):
+    """Generator halaman sampai semua source habis (untuk mode streaming)."""
+    state = None
+    try:
+        while True:
+            page, state = fetch_page(es, timeframe, extra_filters, page_size, state, predicate)
+            if page:
+                yield page
+            if is_exhausted(state):
+                break
+    finally:
+        if state is not None:
+            close_state(es, state)
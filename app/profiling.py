@@ -0,0 +1,147 @@
+# app/profiling.py
+import contextvars
+import cProfile
+import os
+import pstats
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Folder tujuan file .prof per request (opsional). Kosong = hanya Server-Timing.
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+
+# Profil aktif untuk request saat ini (None = request biasa, tanpa overhead)
+_current_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Kumpulan durasi per tahap (untuk header Server-Timing) dan, kalau
+    PROFILE_DIR di-set, hasil cProfile dari thread request & thread pool
+    yang mengerjakan request ini.
+    """
+
+    def __init__(self, name, with_cprofile=False):
+        self.name = name
+        self.with_cprofile = with_cprofile
+        self.timings = []
+        self.profile_file = None
+        self._stats = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def record(self, stage, seconds, desc=None):
+        # list.append atomic → aman dari beberapa thread pool sekaligus
+        self.timings.append((stage, seconds, desc))
+
+    def add_profiler(self, profiler):
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def server_timing(self):
+        """
+        Nilai header Server-Timing. Tahap dengan nama sama (mis. timeline per
+        source) dijumlahkan; jumlah kejadiannya masuk desc.
+        """
+        merged = {}
+        for stage, seconds, desc in self.timings:
+            total, count, first_desc = merged.get(stage, (0.0, 0, desc))
+            merged[stage] = (total + seconds, count + 1, first_desc)
+
+        parts = []
+        for stage, (seconds, count, desc) in merged.items():
+            if count > 1:
+                desc = f"x{count}"
+            part = f"{stage};dur={seconds * 1000:.1f}"
+            if desc:
+                part += f';desc="{desc}"'
+            parts.append(part)
+        parts.append(f"total;dur={(time.perf_counter() - self._started) * 1000:.1f}")
+        return ", ".join(parts)
+
+    def dump(self):
+        """Simpan hasil cProfile ke PROFILE_DIR, return nama file (atau None)."""
+        if self._stats is None or not PROFILE_DIR:
+            return None
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        filename = f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof"
+        self._stats.dump_stats(os.path.join(PROFILE_DIR, filename))
+        self.profile_file = filename
+        return filename
+
+
+def _start_profiler():
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Profiler lain sedang aktif (mis. request lain yang juga diprofil)
+        return None
+    return profiler
+
+
+def _profiled_call(fn, args, kwargs):
+    profile = _current_profile.get()
+    profiler = _start_profiler() if profile is not None and profile.with_cprofile else None
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile.add_profiler(profiler)
+
+
+@contextmanager
+def request_profile(enabled, name):
+    """
+    Aktifkan profil untuk blok ini kalau enabled (header X-Debug-Profile).
+    Yield RequestProfile (atau None kalau tidak aktif).
+    """
+    if not enabled:
+        yield None
+        return
+
+    profile = RequestProfile(name, with_cprofile=bool(PROFILE_DIR))
+    token = _current_profile.set(profile)
+    profiler = _start_profiler() if profile.with_cprofile else None
+    try:
+        yield profile
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile.add_profiler(profiler)
+        _current_profile.reset(token)
+
+
+def record_timing(stage, seconds, desc=None):
+    """Catat durasi tahap ke profil request aktif (no-op kalau tidak ada)."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.record(stage, seconds, desc)
+
+
+def submit_with_context(pool, fn, *args, **kwargs):
+    """
+    pool.submit yang membawa context request ke thread worker, supaya
+    tahap yang berjalan di thread pool (fetch per source, normalisasi)
+    tetap tercatat di profil request yang memulainya.
+    """
+    if _current_profile.get() is None:
+        return pool.submit(fn, *args, **kwargs)
+    ctx = contextvars.copy_context()
+    return pool.submit(ctx.run, _profiled_call, fn, args, kwargs)
+
+
+def attach_profile(response, profile):
+    """Tambahkan Server-Timing (dan nama file .prof) ke response."""
+    if profile is None:
+        return response
+    filename = profile.dump()
+    response.headers["Server-Timing"] = profile.server_timing()
+    if filename:
+        response.headers["X-Debug-Profile-File"] = filename
+    return response
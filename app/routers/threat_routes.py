@@ -2,21 +2,34 @@ from fastapi import APIRouter
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi import Depends
 from fastapi import Header, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Any
-from app.elastic_client import es, get_elastic_status
-from ..elastic_client import es
+from ..elastic_client import get_es, get_elastic_status
 from ..services import (
-    get_suricata_events,
-    get_sophos_events,
-    get_panw_events,
-    build_dynamic_filters,
-    calculate_risk_summary,
+    fetch_all_sources,
+    build_source_filters,
     calculate_global_stats,
-    build_event_type_stats,
-    calculate_mitre_stats,
-    calculate_global_attack,
-    build_event_type_ingest
+    build_summary
+)
+from ..materializer import summary_materializer
+from ..metrics import stage
+from ..profiling import request_profile, attach_profile
+from ..serialization import EventJSONResponse, json_dumps
+from ..events import merge_newest
+from ..ingest_rate import ingest_rate_sampler
+from ..index_resolver import index_resolver
+from ..live_tail import live_event_hub
+from ..pagination import (
+    fetch_page,
+    iter_pages,
+    encode_cursor,
+    decode_cursor,
+    is_exhausted,
+    filters_digest,
+    InvalidCursor,
+    CursorExpired,
+    PAGE_SIZE_DEFAULT
 )
 import requests
 import os
@@ -30,7 +43,13 @@ INDEX = os.getenv("ELASTIC_INDEX")
 INDEX_PANW = ".ds-logs-panw.panos-default-*"
 INDEX_SEARCH = "logs-*"
 
-router = APIRouter(prefix="/api/threats", tags=["Threat Analytics"])
+LIVE_HEARTBEAT_SECONDS = 30
+
+router = APIRouter(
+    prefix="/api/threats",
+    tags=["Threat Analytics"],
+    default_response_class=EventJSONResponse
+)
 
 # URL backend utama untuk verifikasi token
 # BACKEND_AUTH_VERIFY = os.getenv("AUTH_VERIFY_URL", "http://103.150.227.205:8080/api/auth/verify-token")
@@ -48,6 +67,15 @@ class EventRequest(BaseModel):
     filters: Optional[List[FilterItem]] = []
     search_query: Optional[str] = None
 
+class EventFilterRequest(EventRequest):
+    # N event terbaru mulai dari offset (limit None = semua)
+    limit: Optional[int] = None
+    offset: Optional[int] = 0
+
+class EventPageRequest(EventRequest):
+    cursor: Optional[str] = None
+    page_size: Optional[int] = PAGE_SIZE_DEFAULT
+
 def verify_internal_access(x_internal_service_key: str = Header(None, alias="X-Internal-Service-Key")):
     # Tambahkan print untuk debugging sementara
     print(f"DEBUG: Key yang diterima = {x_internal_service_key}") 
@@ -60,6 +88,13 @@ def verify_internal_access(x_internal_service_key: str = Header(None, alias="X-I
             detail=f"Forbidden: Key mismatch. Received: {x_internal_service_key}"
         )
 
+def require_es():
+    """Client Elasticsearch aktif, atau 503 kalau client gagal dibuat."""
+    es = get_es()
+    if es is None:
+        raise HTTPException(status_code=503, detail="Elasticsearch unavailable")
+    return es
+
 def evaluate_condition(event: dict, f: FilterItem) -> bool:
     """Helper untuk mengecek apakah satu event memenuhi satu kriteria filter"""
     field = f.field
@@ -88,113 +123,233 @@ def evaluate_condition(event: dict, f: FilterItem) -> bool:
         
     return False   
 
+def event_matches(event: dict, filters, logic: str, search_query: Optional[str]) -> bool:
+    """Filter presisi di Python (AND / OR + search bar) untuk satu event."""
+    # Logika Filter Dinamis (AND / OR)
+    if filters:
+        if logic == "AND":
+            # LOGIKA AND: Harus lolos SEMUA filter
+            if not all(evaluate_condition(event, f) for f in filters):
+                return False
+        else:
+            # LOGIKA OR: Cukup lolos SATU filter saja
+            if not any(evaluate_condition(event, f) for f in filters):
+                return False
+
+    # Logika Search Bar (Universal Search)
+    # Search bar bersifat mempersempit hasil (AND terhadap hasil filter)
+    if search_query:
+        searchable_fields = ["source_ip", "destination_ip", "country", "event_type", "severity"]
+        if not any(search_query in str(event.get(f, "")).lower() for f in searchable_fields):
+            return False
+
+    return True
+
 @router.post("/events/filter", dependencies=[Depends(verify_internal_access)])
-def get_filtered_events(body: EventRequest):
+def get_filtered_events(
+    body: EventFilterRequest,
+    x_debug_profile: Optional[str] = Header(None, alias="X-Debug-Profile")
+):
     timeframe = body.timeframe
     search_query = body.search_query.lower() if body.search_query else None
     logic = body.operator_logic.upper() if body.operator_logic else "AND"
 
-    # 1. Ambil data dari semua source
-    suricata = get_suricata_events(es, INDEX, timeframe)
-    sophos = get_sophos_events(es, INDEX, timeframe)
-    panw = get_panw_events(es, INDEX_PANW, timeframe)
+    # X-Debug-Profile: 1 → header Server-Timing per tahap (+ file .prof kalau PROFILE_DIR di-set)
+    with request_profile(x_debug_profile == "1", "events_filter") as profile:
+        # 1. Ambil data dari semua source (paralel).
+        #    Filter & search bar sudah diterjemahkan ke query Elasticsearch,
+        #    langkah 2 di bawah hanya pengecekan akhir yang presisi.
+        stale = {}
+        with stage("fetch"):
+            suricata, sophos, panw = fetch_all_sources(
+                require_es(), timeframe, body.filters, logic, body.search_query, stale=stale
+            )
 
-    combined = suricata + sophos + panw
+        # 2. Filter dinamis + search bar, sambil k-way merge per source
+        #    (tiap source diurutkan dengan key merge di merge_newest)
+        predicate = None
+        if body.filters or search_query:
+            predicate = lambda event: event_matches(event, body.filters, logic, search_query)
 
-    # 2. Logika Filter Dinamis (AND / OR)
-    if body.filters:
-        filtered_list = []
-        
-        for event in combined:
-            if logic == "AND":
-                # LOGIKA AND: Harus lolos SEMUA filter
-                is_match = True
-                for f in body.filters:
-                    if not evaluate_condition(event, f):
-                        is_match = False
-                        break # Satu gagal, langsung coret event ini
-            else:
-                # LOGIKA OR: Cukup lolos SATU filter saja
-                is_match = False
-                for f in body.filters:
-                    if evaluate_condition(event, f):
-                        is_match = True
-                        break # Satu cocok, langsung ambil event ini
-            
-            if is_match:
-                filtered_list.append(event)
-        
-        combined = filtered_list
+        limit = max(0, body.limit) if body.limit is not None else None
+        with stage("merge"):
+            events, has_more = merge_newest(
+                [suricata, sophos, panw],
+                limit=limit,
+                offset=max(0, body.offset or 0),
+                predicate=predicate
+            )
 
-    # 3. Logika Search Bar (Universal Search)
-    # Search bar bersifat mempersempit hasil (AND terhadap hasil filter)
-    if search_query:
-        searchable_fields = ["source_ip", "destination_ip", "country", "event_type", "severity"]
-        combined = [
-            event for event in combined 
-            if any(search_query in str(event.get(f, "")).lower() for f in searchable_fields)
-        ]
+        # Response langsung (orjson), tanpa jsonable_encoder per event
+        response = EventJSONResponse({
+            "timeframe": timeframe,
+            "operator_logic_used": logic,
+            "filters_applied": body.filters,
+            "count": len(events),
+            "has_more": has_more,
+            "stale": bool(stale),
+            "stale_sources": stale,
+            "events": events
+        })
+
+    return attach_profile(response, profile)
+
+@router.post("/events/filter/page", dependencies=[Depends(verify_internal_access)])
+def get_filtered_events_page(body: EventPageRequest):
+    """
+    Versi paginasi /events/filter: point-in-time + search_after per source.
+    Kirim ulang body yang sama dengan cursor dari response sebelumnya;
+    next_cursor = None berarti data sudah habis.
+    """
+    timeframe = body.timeframe
+    search_query = body.search_query.lower() if body.search_query else None
+    logic = body.operator_logic.upper() if body.operator_logic else "AND"
+
+    filters_key = filters_digest(body.filters, logic, body.search_query)
 
-    # 4. Sorting & Response
-    combined_sorted = sorted(combined, key=lambda x: x.get("timestamp", ""), reverse=True)
+    state = None
+    if body.cursor:
+        try:
+            state = decode_cursor(body.cursor)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if state["timeframe"] != timeframe:
+            raise HTTPException(status_code=400, detail="Cursor does not match timeframe")
+        # Posisi PIT/search_after hanya berlaku untuk filter yang sama
+        if state.get("filters") != filters_key:
+            raise HTTPException(status_code=400, detail="Cursor does not match filters")
+
+    try:
+        events, state = fetch_page(
+            require_es(),
+            timeframe,
+            build_source_filters(body.filters, logic, body.search_query),
+            body.page_size,
+            state,
+            lambda event: event_matches(event, body.filters, logic, search_query),
+            filters_key
+        )
+    except CursorExpired:
+        # PIT sudah kadaluarsa → client harus mulai lagi dari halaman pertama
+        raise HTTPException(status_code=410, detail="Cursor expired, restart paging without cursor")
 
-    return {
+    return EventJSONResponse({
         "timeframe": timeframe,
         "operator_logic_used": logic,
         "filters_applied": body.filters,
-        "count": len(combined_sorted),
-        "events": combined_sorted
-    }
+        "count": len(events),
+        "events": events,
+        "next_cursor": None if is_exhausted(state) else encode_cursor(state)
+    })
 
-@router.post("/events/summary", dependencies=[Depends(verify_internal_access)])
-def get_risk_summary(body: EventRequest):
-    try:
-        timeframe = body.timeframe
-        elastic_status = get_elastic_status()
+@router.post("/events/filter/stream", dependencies=[Depends(verify_internal_access)])
+def stream_filtered_events(body: EventPageRequest):
+    """
+    Streaming NDJSON: satu event per baris, dikirim per halaman begitu
+    tersedia, sehingga memori tetap datar berapapun panjang timeframe.
+    """
+    search_query = body.search_query.lower() if body.search_query else None
+    logic = body.operator_logic.upper() if body.operator_logic else "AND"
 
-        suricata = get_suricata_events(es, INDEX, timeframe) or []
-        sophos = get_sophos_events(es, INDEX, timeframe) or []
-        panw = get_panw_events(es, INDEX_PANW, timeframe) or []
+    pages = iter_pages(
+        require_es(),
+        body.timeframe,
+        build_source_filters(body.filters, logic, body.search_query),
+        body.page_size,
+        lambda event: event_matches(event, body.filters, logic, search_query)
+    )
 
-        combined = suricata + sophos + panw
+    def generate():
+        for page in pages:
+            yield b"".join(json_dumps(event) + b"\n" for event in page)
 
-        summary = calculate_risk_summary(combined)
-        global_stats = calculate_global_stats(combined, timeframe)
-        event_type_stats = build_event_type_stats(suricata, sophos, panw, timeframe)
-        event_type_ingest = build_event_type_ingest(suricata, sophos, panw, timeframe)
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
-        # 🔥 HITUNG MITRE
-        mitre_stats = calculate_mitre_stats(combined)
-        global_attack = calculate_global_attack(combined)
+@router.websocket("/ws/events", dependencies=[Depends(verify_internal_access)])
+async def stream_live_events(websocket: WebSocket, sources: Optional[str] = None):
+    """
+    Live event stream. Hanya event baru (sejak koneksi dibuka) yang dikirim,
+    dari satu tail poller yang dipakai bersama semua client.
+    Query param sources=suricata,sophos membatasi source yang dikirim.
+    """
+    wanted = set(sources.split(",")) if sources else None
 
-        return {
-            "timeframe": timeframe,
-            "status_connect": elastic_status,
-            "count": len(summary),
-            "summary": summary,
-            "mitre": mitre_stats,
-            "global_attack": global_attack,
-            "events": [
-                {
-                    "total": global_stats["total"],
-                    "seconds": global_stats["seconds"],
-                    "list": event_type_stats
-                }
-            ],
-            "events_ingest": [
-                {
-                    "total": global_stats["total"],
-                    "seconds": global_stats["seconds"],
-                    "list": event_type_ingest
-                }
-            ]
-        }
-
-    except Exception as e:
-        print("🔥 ERROR:", e)
-        print(traceback.format_exc())
-        
+    await websocket.accept()
+    queue = live_event_hub.subscribe()
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=LIVE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Heartbeat, sekaligus mendeteksi client yang sudah putus
+                await websocket.send_text(json.dumps({"type": "ping"}))
+                continue
+
+            if wanted is not None:
+                events = {s: e for s, e in message["events"].items() if s in wanted}
+                if not any(events.values()):
+                    continue
+                message = dict(
+                    message,
+                    events=events,
+                    counts={s: c for s, c in message["counts"].items() if s in wanted}
+                )
+            await websocket.send_text(json_dumps(message).decode())
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        live_event_hub.unsubscribe(queue)
+
+@router.get("/events/rate", dependencies=[Depends(verify_internal_access)])
+def get_ingest_rate():
+    """Ingest rate (event/detik) per source dari sampler background."""
+    return ingest_rate_sampler.get_rates()
 
+@router.get("/events/indices", dependencies=[Depends(verify_internal_access)])
+def get_index_ranges():
+    """Backing index yang dikenal resolver per pola (jumlah, write index, umur cache rentang)."""
+    return index_resolver.status()
 
+@router.post("/events/summary", dependencies=[Depends(verify_internal_access)])
+def get_risk_summary(
+    body: EventRequest,
+    x_debug_profile: Optional[str] = Header(None, alias="X-Debug-Profile")
+):
+    timeframe = body.timeframe
+    elastic_status = get_elastic_status()
+    stale = False
+
+    with request_profile(x_debug_profile == "1", "events_summary") as profile:
+        # Snapshot dari materializer kalau ada, kalau belum hitung langsung
+        snapshot = summary_materializer.get_snapshot(timeframe)
+        if snapshot is not None:
+            payload, age = snapshot
+            stale = summary_materializer.is_overdue(timeframe, age)
+        else:
+            try:
+                with stage("build_summary"):
+                    payload, age = build_summary(get_es(), timeframe), 0
+                summary_materializer.store(timeframe, payload)
+            except Exception as e:
+                print("🔥 ERROR:", e)
+                print(traceback.format_exc())
+                # Elasticsearch bermasalah → pakai hasil sukses terakhir
+                last_good = summary_materializer.last_good(timeframe)
+                if last_good is None:
+                    raise HTTPException(status_code=503, detail="Elasticsearch unavailable")
+                payload, age = last_good
+                stale = True
 
+        # Rate per detik selalu pakai nilai terbaru dari sampler
+        seconds = calculate_global_stats([], timeframe)["seconds"]
+
+        response = EventJSONResponse({
+            **payload,
+            "status_connect": elastic_status,
+            "snapshot_age": age,
+            "stale": stale or bool(payload.get("stale_sources")),
+            "events": [dict(e, seconds=seconds) for e in payload["events"]],
+            "events_ingest": [dict(e, seconds=seconds) for e in payload["events_ingest"]]
+        })
 
+    return attach_profile(response, profile)
@@ -0,0 +1,77 @@
+# app/serialization.py
+import orjson
+from elasticsearch.serializer import JSONSerializer
+from elasticsearch.exceptions import SerializationError
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from .events import Event
+from .metrics import RESPONSE_BYTES, stage
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def orjson_default(obj):
+    """Tipe yang tidak dikenal orjson: Event, model pydantic, set."""
+    if isinstance(obj, Event):
+        return obj.to_dict()
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def json_dumps(obj):
+    """Encode ke bytes JSON (untuk NDJSON / websocket)."""
+    return orjson.dumps(obj, default=orjson_default, option=ORJSON_OPTIONS)
+
+
+# ======================================================
+# ELASTICSEARCH TRANSPORT
+# ======================================================
+
+class ORJSONSerializer(JSONSerializer):
+    """
+    Serializer orjson untuk elasticsearch-py (request body & response).
+    dumps tetap mengembalikan str supaya helper NDJSON client
+    ("\\n".join(...) di bulk/msearch) tetap jalan.
+    """
+
+    def _default(self, data):
+        try:
+            return orjson_default(data)
+        except TypeError:
+            return self.default(data)
+
+    def loads(self, s):
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError as e:
+            raise SerializationError(s, e)
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        try:
+            return orjson.dumps(data, default=self._default, option=ORJSON_OPTIONS).decode()
+        except TypeError as e:
+            raise SerializationError(data, e)
+
+
+# ======================================================
+# RESPONSE API
+# ======================================================
+
+class EventJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse yang juga bisa encode Event & model pydantic.
+    Route yang mengembalikan instance ini langsung tidak lewat
+    jsonable_encoder FastAPI (yang lambat untuk list event besar).
+    """
+
+    def render(self, content):
+        with stage("encode_response"):
+            body = json_dumps(content)
+        RESPONSE_BYTES.observe(len(body))
+        return body
@@ -1,22 +1,40 @@
 from datetime import datetime, timedelta, timezone
-from .elastic_client import es
+from .elastic_client import ELASTIC_AGG_TIMEOUT
+from .circuit_breaker import CircuitOpenError
+from .cache import cached_fetch
+from .index_resolver import index_resolver
+from .extractors import NORMALIZERS, SOURCE_MAPPINGS, build_field_map, source_fields
+from .metrics import stage, timed_search, timed_stage
+from .profiling import submit_with_context
+from .timeframe import resolve_timeframe
 # from .database import SessionLocal
 # from .models import CountIP
 # from sqlalchemy.orm import Session
+from elasticsearch.exceptions import TransportError
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional
 from collections import defaultdict
 from datetime import datetime, timedelta   
-from dateutil import parser
-from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
+import sys
 import math
 import re
+import ipaddress
 
 INDEX = os.getenv("ELASTIC_INDEX")
 INDEX_PANW = ".ds-logs-panw.panos-default-*"
 INDEX_SEARCH = "logs-*"
 
+# Pool untuk fan-out query ke 3 source (Suricata, Sophos, PAN-OS) sekaligus.
+# Dipakai bersama oleh semua request, jadi ukurannya = 3 x request paralel.
+SOURCE_FETCH_WORKERS = int(os.getenv("SOURCE_FETCH_WORKERS", "24"))
+_source_pool = ThreadPoolExecutor(
+    max_workers=SOURCE_FETCH_WORKERS,
+    thread_name_prefix="es-source-fetch"
+)
+
 class FilterItem(BaseModel):
     field: str
     operator: str
@@ -27,251 +45,393 @@ class SearchRequest(BaseModel):
     timeframe: Optional[str] = None
 
 
+class SourceEvents(list):
+    """
+    Hasil fetcher satu source: list event ternormalisasi, ditambah timeline
+    dari date_histogram Elasticsearch (None kalau timeframe tidak punya timeline).
+    """
+
+    def __init__(self, events=(), timeline=None):
+        super().__init__(events)
+        self.timeline = timeline
+
+
 def get_time_range_filter(timeframe: str):
-    jakarta_tz = ZoneInfo("Asia/Jakarta")
-    now = datetime.now(tz=jakarta_tz)
+    # Batas window dibulatkan (lihat app/timeframe.py) → query berulang bisa kena request cache
+    return resolve_timeframe(timeframe).range_filter()
 
-    if timeframe == "today":
-        # mulai dari jam 00:00 UTC
-        start = datetime(now.year, now.month, now.day)
-    elif timeframe == "last1minutes" or timeframe == "1minutes":
-        start = now - timedelta(seconds=5)
-    elif timeframe == "yesterday":
-        start = now - timedelta(days=1)
-    elif timeframe == "1hours" or timeframe == "last1hours":
-        start = now - timedelta(hours=1)
-    elif timeframe == "8hours" or timeframe == "last8hours":
-        start = now - timedelta(hours=8)
-    elif timeframe == "24hours" or timeframe == "last24hours":
-        start = now - timedelta(hours=24)
-    elif timeframe == "last3days":
-        start = now - timedelta(days=3)
-    elif timeframe == "last7days":
-        start = now - timedelta(days=7)
-    elif timeframe == "last30days":
-        start = now - timedelta(days=30)
-    elif timeframe == "last60days":
-        start = now - timedelta(days=60)
-    elif timeframe == "last90days":
-        start = now - timedelta(days=90)
-    else:
-        start = now - timedelta(days=1)
-    return {"range": {"@timestamp": {"gte": start.isoformat(), "lte": now.isoformat()}}}
+def index_params(index, timeframe):
+    # Pola index → backing index yang overlap window saja (lihat app/index_resolver.py)
+    window = resolve_timeframe(timeframe)
+    return index_resolver.search_params(index, window.start_ms, window.end_ms)
 
 def get_time_range_for_stats(timeframe: str):
-    jakarta_tz = ZoneInfo("Asia/Jakarta")
-    now = datetime.now(tz=jakarta_tz)
+    # Window yang sama persis dengan yang dikirim ke Elasticsearch
+    window = resolve_timeframe(timeframe)
+    return window.start, window.end
+
+# Filter dasar tiap source (selain rentang waktu)
+SOURCE_FILTERS = {
+    "suricata": [
+        {"term": {"event.module": "suricata"}}
+    ],
+    "sophos": [
+        {"term": {"event.module": "sophos"}},
+        {"terms": {"sophos.xg.log_type": ["IDP", "Content Filtering"]}}
+    ],
+    "panw": [
+        {"term": {"event.module": "panw"}},
+        {"term": {"panw.panos.type": "THREAT"}},
+        {"terms": {"panw.panos.sub_type": ["file", "vulnerability"]}}
+    ],
+}
+
+# Normalizer dokumen mentah → Event, di-compile sekali dari SOURCE_MAPPINGS
+normalize_suricata_hit = NORMALIZERS["suricata"]
+normalize_sophos_hit = NORMALIZERS["sophos"]
+normalize_panw_hit = NORMALIZERS["panw"]
+
+# Hanya field yang dibaca normalizer yang diambil dari _source
+SOURCE_INCLUDES = {
+    source: source_fields(mapping)
+    for source, mapping in SOURCE_MAPPINGS.items()
+}
+
+# filter_path: hanya bagian response yang benar-benar dibaca
+# (tanpa _shards, _index/_score per hit, dsb.; took untuk metrik).
+# Bagian yang kosong bisa hilang dari response → selalu baca pakai .get()
+TIMELINE_FILTER_PATH = [
+    "aggregations.timeline.buckets.key_as_string",
+    "aggregations.timeline.buckets.doc_count",
+]
+DOC_FILTER_PATH = ["took", "hits.hits._source"] + TIMELINE_FILTER_PATH
+SURICATA_FILTER_PATH = [
+    "took",
+    "aggregations.by_rule.buckets.key",
+    "aggregations.by_rule.buckets.doc_count",
+    "aggregations.by_rule.buckets.sample_event.hits.hits._source",
+    "aggregations.by_rule.buckets.first_event",
+    "aggregations.by_rule.buckets.last_event",
+] + TIMELINE_FILTER_PATH
+SURICATA_COMPOSITE_FILTER_PATH = ["aggregations.by_rule.after_key"] + SURICATA_FILTER_PATH
+
+# Mode agregasi rule Suricata:
+#   terms     : satu terms agg, top SURICATA_TERMS_SIZE rule (sisanya terpotong)
+#   composite : seluruh rule dipaging dengan after_key, SURICATA_COMPOSITE_PAGE_SIZE
+#               bucket per request (beban per request ke cluster tetap kecil)
+SURICATA_AGG_MODE = os.getenv("SURICATA_AGG_MODE", "terms").lower()
+SURICATA_TERMS_SIZE = int(os.getenv("SURICATA_TERMS_SIZE", "500"))
+SURICATA_COMPOSITE_PAGE_SIZE = int(os.getenv("SURICATA_COMPOSITE_PAGE_SIZE", "100"))
+# Batas jumlah rule yang diambil (0 = tanpa batas / semua rule di window)
+SURICATA_RULE_LIMIT = int(os.getenv("SURICATA_RULE_LIMIT", "0"))
+
+# Contoh event terbaru per rule:
+#   top_hits : sub-agregasi top_hits di setiap bucket (satu request, berat di cluster)
+#   collapse : bucket hanya min/max; contoh event diambil dengan search collapse
+#              pada rule.name.keyword, hanya untuk rule yang ada di hasil agregasi
+SURICATA_SAMPLE_MODE = os.getenv("SURICATA_SAMPLE_MODE", "top_hits").lower()
+
+# Sub-agregasi per rule: waktu pertama/terakhir (+ contoh event di mode top_hits)
+SURICATA_RANGE_AGGS = {
+    "first_event": {"min": {"field": "@timestamp"}},
+    "last_event": {"max": {"field": "@timestamp"}}
+}
+SURICATA_BUCKET_AGGS = dict(SURICATA_RANGE_AGGS, sample_event={
+    "top_hits": {
+        "size": 1,
+        "sort": [{"@timestamp": {"order": "desc"}}],
+        "_source": SOURCE_INCLUDES["suricata"]
+    }
+})
+SURICATA_SAMPLE_FILTER_PATH = ["took", "hits.hits._source", "hits.hits.fields"]
 
-    if timeframe == "today":
-        start = datetime(now.year, now.month, now.day)
-    elif timeframe == "last1seconds" or timeframe == "1seconds":
-        start = now - timedelta(seconds=5)
-    elif timeframe == "yesterday":
-        start = now - timedelta(days=1)
-    elif timeframe == "1hours" or timeframe == "last1hours":
-        start = now - timedelta(hours=1)
-    elif timeframe in ["8hours", "last8hours"]:
-        start = now - timedelta(hours=8)
-    elif timeframe in ["24hours", "last24hours"]:
-        start = now - timedelta(hours=24)
-    elif timeframe == "last3days":
-        start = now - timedelta(days=3)
-    elif timeframe == "last7days":
-        start = now - timedelta(days=7)
-    elif timeframe == "last30days":
-        start = now - timedelta(days=30)
-    elif timeframe == "last60days":
-        start = now - timedelta(days=60)
-    elif timeframe == "last90days":
-        start = now - timedelta(days=90)
-    else:
-        start = now - timedelta(days=1)
+def build_suricata_query(timeframe, extra_filters, by_rule):
+    """Query Suricata dengan agregasi by_rule (terms / composite) + sub-agregasi per rule."""
+    bucket_aggs = SURICATA_RANGE_AGGS if SURICATA_SAMPLE_MODE == "collapse" else SURICATA_BUCKET_AGGS
+    return {
+        "size": 0,
+        "query": {
+            "bool": {
+                "filter": [
+                    get_time_range_filter(timeframe)
+                ] + SOURCE_FILTERS["suricata"] + (extra_filters or [])
+            }
+        },
+        "aggs": {
+            "by_rule": dict(by_rule, aggs=bucket_aggs)
+        }
+    }
 
-    return start, now
+def suricata_bucket_rule(bucket):
+    # key terms = str, key composite = {"rule": str}
+    key = bucket["key"]
+    return key["rule"] if isinstance(key, dict) else key
+
+def get_suricata_samples(es, INDEX, timeframe, extra_filters, rules):
+    """
+    Event terbaru per rule lewat collapse (pengganti top_hits per bucket).
+    Return {rule_name: _source}.
+    """
+    if not rules:
+        return {}
 
-def get_suricata_events(es, INDEX, timeframe):
     query = {
-        "size": 0,
+        "size": len(rules),
         "query": {
             "bool": {
                 "filter": [
                     get_time_range_filter(timeframe),
-                    {"term": {"event.module": "suricata"}}
-                ]
+                    {"terms": {"rule.name.keyword": rules}}
+                ] + SOURCE_FILTERS["suricata"] + (extra_filters or [])
             }
         },
-        "aggs": {
-            "by_rule": {
-                "terms": {"field": "rule.name.keyword", "size": 500},
-                "aggs": {
-                    "sample_event": {
-                        "top_hits": {
-                            "size": 1,
-                            "sort": [{"@timestamp": {"order": "desc"}}],
-                            "_source": [
-                                "source.ip",
-                                "destination.ip",
-                                "rule.category",
-                                "source.geo.country_name",
-                                "destination.geo.country_name",
-                                "event.severity_label",
-                                "destination.port",
-                                "mitre.stages",
-                                "log.id.uid",
-                                "network.transport",
-                                "source.geo.location.lon",
-                                "source.geo.location.lat",
-                                "destination.geo.location.lon",
-                                "destination.geo.location.lat",
-                                "@timestamp"
-                            ]
-                        }
-                    },
-                    "first_event": {"min": {"field": "@timestamp"}},
-                    "last_event": {"max": {"field": "@timestamp"}}
-                }
-            }
-        }
+        "collapse": {"field": "rule.name.keyword"},
+        "sort": [{"@timestamp": {"order": "desc"}}],
+        "_source": SOURCE_INCLUDES["suricata"],
+        "track_total_hits": False
     }
+    res = timed_search(
+        es, "suricata_sample", timeframe,
+        body=query, filter_path=SURICATA_SAMPLE_FILTER_PATH, request_timeout=ELASTIC_AGG_TIMEOUT,
+        **index_params(INDEX, timeframe)
+    )
+
+    samples = {}
+    for h in res.get("hits", {}).get("hits", []):
+        src = h.get("_source", {})
+        # Nilai collapse ada di fields; fallback ke _source
+        rule = (h.get("fields", {}).get("rule.name.keyword") or [(src.get("rule") or {}).get("name")])[0]
+        samples[rule] = src
+    return samples
+
+def append_suricata_buckets(results, buckets, samples=None):
+    """
+    Normalisasi bucket by_rule ke results. samples = {rule: _source} dari
+    get_suricata_samples (mode collapse), None = pakai top_hits di bucket.
+    """
+    with stage("normalize_suricata"):
+        for bucket in buckets:
+            key = suricata_bucket_rule(bucket)
+            if samples is not None:
+                hit = samples.get(key, {})
+            else:
+                sample = bucket.get("sample_event", {}).get("hits", {}).get("hits", [])
+                hit = sample[0].get("_source", {}) if sample else {}
+
+            results.append(normalize_suricata_hit(hit, {
+                "description": sys.intern(key),
+                "count": bucket["doc_count"],
+                "first_event": bucket.get("first_event", {}).get("value_as_string"),
+                "last_event": bucket.get("last_event", {}).get("value_as_string"),
+            }))
+
+def get_suricata_events(es, INDEX, timeframe, extra_filters=None, limit=None):
+    limit = limit or SURICATA_RULE_LIMIT or None
+    if SURICATA_AGG_MODE == "composite":
+        return get_suricata_events_composite(es, INDEX, timeframe, extra_filters, limit)
+
+    size = min(limit, SURICATA_TERMS_SIZE) if limit else SURICATA_TERMS_SIZE
+    query = build_suricata_query(
+        timeframe, extra_filters, {"terms": {"field": "rule.name.keyword", "size": size}}
+    )
+    add_timeline_agg(query, timeframe)
+
+    res = timed_search(
+        es, "suricata", timeframe,
+        body=query, filter_path=SURICATA_FILTER_PATH, request_timeout=ELASTIC_AGG_TIMEOUT,
+        request_cache=True, **index_params(INDEX, timeframe)
+    )
+
+    results = SourceEvents(timeline=parse_timeline_agg(res))
+    buckets = (res.get("aggregations") or {}).get("by_rule", {}).get("buckets", [])
+    samples = None
+    if SURICATA_SAMPLE_MODE == "collapse":
+        samples = get_suricata_samples(
+            es, INDEX, timeframe, extra_filters, [suricata_bucket_rule(b) for b in buckets]
+        )
+    append_suricata_buckets(results, buckets, samples)
+    return results
 
-    res = es.search(index=INDEX, body=query)
+def get_suricata_events_composite(es, INDEX, timeframe, extra_filters=None, limit=None):
+    """
+    Semua rule Suricata lewat composite aggregation, dipaging dengan after_key.
+    Tiap halaman langsung dinormalisasi lalu response-nya dibuang, jadi memori
+    tetap kecil di cluster maupun di sini. Berhenti lebih awal begitu limit
+    tercapai. Urutan rule mengikuti nama (bukan jumlah event seperti terms).
+    """
+    results = SourceEvents()
+    after_key = None
 
-    results = []
-    for bucket in res["aggregations"]["by_rule"]["buckets"]:
-        hit = bucket["sample_event"]["hits"]["hits"][0]["_source"] if bucket["sample_event"]["hits"]["hits"] else {}
+    while True:
+        page_size = SURICATA_COMPOSITE_PAGE_SIZE
+        if limit:
+            page_size = min(page_size, limit - len(results))
 
-        results.append({
-            "destination_ip": hit.get("destination", {}).get("ip"),
-            "source_ip": hit.get("source", {}).get("ip"),
-            "country": hit.get("source", {}).get("geo", {}).get("country_name"),
-            "event_type": "suricata",
-            "sub_type": hit.get("rule", {}).get("category"),
-            "severity": hit.get("event", {}).get("severity_label"),
-            "timestamp": hit.get("@timestamp"),
-            "mitre_stages": hit.get("mitre", {}).get("stages"),
-            "event_id": hit.get("log", {}).get("id", {}).get("uid"),
-            "application": "application",
-            "description": bucket["key"],
-            "protocol": hit.get("network", {}).get("transport"),
-            "destination_country": hit.get("destination", {}).get("geo", {}).get("country_name"),
-            "port": hit.get("destination", {}).get("port"),
-            "count": bucket["doc_count"],
-            "first_event": bucket["first_event"].get("value_as_string"),
-            "last_event": bucket["last_event"].get("value_as_string"),
-            "source_longitude": hit.get("source", {}).get("geo", {}).get("location", {}).get("lon"),
-            "source_latitude": hit.get("source", {}).get("geo", {}).get("location", {}).get("lat"),
-            "destination_longitude": hit.get("destination", {}).get("geo", {}).get("location", {}).get("lon"),
-            "destination_latitude": hit.get("destination", {}).get("geo", {}).get("location", {}).get("lat")
-        })
+        composite = {
+            "size": page_size,
+            "sources": [{"rule": {"terms": {"field": "rule.name.keyword"}}}]
+        }
+        if after_key:
+            composite["after"] = after_key
+
+        query = build_suricata_query(timeframe, extra_filters, {"composite": composite})
+        first_page = after_key is None
+        if first_page:
+            # Timeline cukup dihitung sekali untuk seluruh window
+            add_timeline_agg(query, timeframe)
+
+        res = timed_search(
+            es, "suricata", timeframe,
+            body=query, filter_path=SURICATA_COMPOSITE_FILTER_PATH,
+            request_timeout=ELASTIC_AGG_TIMEOUT, request_cache=True, **index_params(INDEX, timeframe)
+        )
+        if first_page:
+            results.timeline = parse_timeline_agg(res)
+
+        by_rule = (res.get("aggregations") or {}).get("by_rule", {})
+        buckets = by_rule.get("buckets", [])
+        samples = None
+        if SURICATA_SAMPLE_MODE == "collapse":
+            samples = get_suricata_samples(
+                es, INDEX, timeframe, extra_filters, [suricata_bucket_rule(b) for b in buckets]
+            )
+        append_suricata_buckets(results, buckets, samples)
+
+        after_key = by_rule.get("after_key")
+        if not after_key or len(buckets) < page_size or (limit and len(results) >= limit):
+            break
 
     return results
 
-def get_sophos_events(es, INDEX, timeframe):
+def get_sophos_events(es, INDEX, timeframe, extra_filters=None):
     query = {
         "size": 500,
         "query": {
             "bool": {
                 "filter": [
-                    get_time_range_filter(timeframe),
-                    {"term": {"event.module": "sophos"}},
-                    {"terms": {"sophos.xg.log_type": ["IDP", "Content Filtering"]}}
-                ]
+                    get_time_range_filter(timeframe)
+                ] + SOURCE_FILTERS["sophos"] + (extra_filters or [])
             }
         },
+        "_source": SOURCE_INCLUDES["sophos"],
         "sort": [{"@timestamp": {"order": "desc"}}]
     }
+    add_timeline_agg(query, timeframe)
 
-    res = es.search(index=INDEX, body=query)
+    res = timed_search(
+        es, "sophos", timeframe, body=query, filter_path=DOC_FILTER_PATH, **index_params(INDEX, timeframe)
+    )
     hits = res.get("hits", {}).get("hits", [])
-    results = []
+    results = SourceEvents(timeline=parse_timeline_agg(res))
 
-    for h in hits:
-        src = h["_source"]
-        sophos = src.get("sophos", {}).get("xg", {})
-
-        rule_name = (
-            sophos.get("message") or
-            sophos.get("rule_name") or
-            "unknown"
-        )
-
-        results.append({
-            "destination_ip": src.get("destination", {}).get("ip"),
-            "source_ip": src.get("source", {}).get("ip"),
-            "country": src.get("source", {}).get("geo", {}).get("country_name"),
-            "event_type": "sophos",
-            "sub_type": sophos.get("log_type"),
-            "severity": src.get("event", {}).get("severity_label") or src.get("log", {}).get("level"),
-            "timestamp": src.get("@timestamp"),
-            "mitre_stages": src.get("mitre", {}).get("stages"),
-            "event_id": src.get("log", {}).get("id", {}).get("uid"),
-            "application": sophos.get("app_name"),
-            "description": rule_name,
-            "protocol": src.get("network", {}).get("transport"),
-            "destination_country": src.get("destination", {}).get("geo", {}).get("country_name"),
-            "port": src.get("destination", {}).get("port") or sophos.get("dst_port"),
-            "count": 1,
-            "first_event": src.get("@timestamp"),
-            "last_event": src.get("@timestamp"),
-            "source_longitude": src.get("source", {}).get("geo", {}).get("location", {}).get("lon"),
-            "source_latitude": src.get("source", {}).get("geo", {}).get("location", {}).get("lat"),
-            "destination_longitude": src.get("destination", {}).get("geo", {}).get("location", {}).get("lon"),
-            "destination_latitude": src.get("destination", {}).get("geo", {}).get("location", {}).get("lat")
-        })
+    with stage("normalize_sophos"):
+        for h in hits:
+            results.append(normalize_sophos_hit(h.get("_source", {})))
 
     return results
 
-def get_panw_events(es, INDEX_PANW, timeframe):
+def get_panw_events(es, INDEX_PANW, timeframe, extra_filters=None):
     query = {
         "size": 500,
         "query": {
             "bool": {
                 "filter": [
-                    get_time_range_filter(timeframe),
-                    {"term": {"event.module": "panw"}},
-                    {"term": {"panw.panos.type": "THREAT"}},
-                    {"terms": {"panw.panos.sub_type": ["file", "vulnerability"]}}
-                ]
+                    get_time_range_filter(timeframe)
+                ] + SOURCE_FILTERS["panw"] + (extra_filters or [])
             }
         },
+        "_source": SOURCE_INCLUDES["panw"],
         "sort": [{"@timestamp": {"order": "desc"}}]
     }
+    add_timeline_agg(query, timeframe)
 
-    res = es.search(index=INDEX_PANW, body=query)
+    res = timed_search(
+        es, "panw", timeframe, body=query, filter_path=DOC_FILTER_PATH, **index_params(INDEX_PANW, timeframe)
+    )
     hits = res.get("hits", {}).get("hits", [])
 
-    results = []
+    results = SourceEvents(timeline=parse_timeline_agg(res))
 
-    for h in hits:
-        src = h["_source"]
-        panw = src.get("panw", {}).get("panos", {})
-
-        results.append({
-            "destination_ip": src.get("destination", {}).get("ip"),
-            "source_ip": src.get("source", {}).get("ip"),
-            "country": src.get("source", {}).get("geo", {}).get("country_name"),
-            "event_type": "panw",
-            "sub_type": panw.get("sub_type"),
-            "severity": src.get("log", {}).get("syslog", {}).get("severity", {}).get("name"),
-            "timestamp": src.get("@timestamp"),
-            "mitre_stages": src.get("mitre", {}).get("stages"),
-            "event_id": panw.get("seqno"),
-            "application": panw.get("app"),
-            "description": panw.get("threat", {}).get("name"),
-            "protocol": src.get("network", {}).get("transport"),
-            "destination_country": src.get("destination", {}).get("geo", {}).get("country_name"),
-            "port": src.get("destination", {}).get("port") or panw.get("dest_port"),
-            "count": 1,
-            "first_event": src.get("@timestamp"),
-            "last_event": src.get("@timestamp"),
-            "source_longitude": src.get("source", {}).get("geo", {}).get("location", {}).get("lon"),
-            "source_latitude": src.get("source", {}).get("geo", {}).get("location", {}).get("lat"),
-            "destination_longitude": src.get("destination", {}).get("geo", {}).get("location", {}).get("lon"),
-            "destination_latitude": src.get("destination", {}).get("geo", {}).get("location", {}).get("lat")
-        })
+    with stage("normalize_panw"):
+        for h in hits:
+            results.append(normalize_panw_hit(h.get("_source", {})))
 
     return results
 
+SOURCE_FETCHERS = [
+    ("suricata", get_suricata_events, INDEX),
+    ("sophos", get_sophos_events, INDEX),
+    ("panw", get_panw_events, INDEX_PANW),
+]
+
+# Index & normalizer dokumen mentah per source
+SOURCE_INDEX = {
+    "suricata": INDEX,
+    "sophos": INDEX,
+    "panw": INDEX_PANW,
+}
+
+HIT_NORMALIZERS = {
+    "suricata": normalize_suricata_hit,
+    "sophos": normalize_sophos_hit,
+    "panw": normalize_panw_hit,
+}
+
+def fetch_all_sources(es, timeframe, filters=None, logic="AND", search_query=None, stale=None):
+    """
+    Jalankan query Suricata, Sophos & PAN-OS secara paralel lalu tunggu
+    ketiganya selesai. Latency = source paling lambat, bukan jumlah ketiganya.
+    Hasil tiap source di-cache per (source, index, timeframe, filter) dengan TTL.
+
+    filters / search_query diterjemahkan ke bool query per source, jadi
+    seleksi dilakukan Elasticsearch di seluruh index.
+
+    stale (dict, opsional) diisi {source: umur_detik} untuk source yang
+    dijawab dari hasil lama (circuit breaker terbuka / refresh berjalan).
+    """
+    source_filters = build_source_filters(filters, logic, search_query)
+
+    pending = []
+    for source, fetcher, index in SOURCE_FETCHERS:
+        extra_filters = source_filters[source]
+        if extra_filters is None:
+            # Filter pasti tidak cocok dengan source ini → tidak perlu query
+            pending.append(SourceEvents())
+            continue
+
+        # Tanpa filter, window yang masih tercakup rolling store cukup di-slice
+        stored = fetch_from_event_store(source, timeframe) if not extra_filters else None
+        if stored is not None:
+            pending.append(stored)
+            continue
+
+        pending.append(submit_with_context(
+            _source_pool, cached_fetch, source, fetcher, es, index, timeframe, extra_filters, stale
+        ))
+
+    suricata, sophos, panw = (
+        f if isinstance(f, SourceEvents) else f.result()
+        for f in pending
+    )
+    return suricata, sophos, panw
+
+def get_time_range_ms(timeframe):
+    """Awal window get_time_range_filter dalam epoch ms."""
+    return resolve_timeframe(timeframe).start_ms
+
+def fetch_from_event_store(source, timeframe):
+    from .event_store import event_store
+
+    start_ms = get_time_range_ms(timeframe)
+    if not event_store.covers(source, start_ms):
+        return None
+
+    events = SourceEvents(event_store.slice(source, start_ms))
+    if get_timeline_window(timeframe) is not None:
+        # Timeline dari semua event di window, bukan hanya hasil slice
+        events.timeline = build_timeline(event_store.timeline_events(source, start_ms), timeframe)
+    return events
+
 def compute_top5_risk(combined):
 
     # =============================
@@ -442,6 +602,107 @@ def compute_top5_risk(combined):
 
     return results[:5]
 
+# ======================================================
+# RISK SCORING (dipakai versi Python & versi agregasi ES)
+# ======================================================
+
+def risk_module_weight(modul):
+    return {
+        "suricata": 1.0,
+        "panw": 1.2,
+        "sophos": 1.3
+    }.get(modul, 1.0)
+
+def risk_severity_weight(severity):
+    return {
+        "critical": 5.0,
+        "severe": 5.0,
+        "high": 3.5,
+        "medium": 2.0,
+        "low": 1.0
+    }.get(severity, 0.5)
+
+def risk_sub_type_weight(sub):
+    if sub in ["malware","c2","command_and_control","data_exfil","exfiltration"]:
+        return 5.5
+    elif sub in ["exploit_attempt","exploit","intrusion","lateral_movement"]:
+        return 4.5
+    elif sub in ["auth_bruteforce","password_spray","credential_access"]:
+        return 3.8
+    elif sub in ["policy_violation","misconfiguration"]:
+        return 1.8
+    return 1.0
+
+def risk_rule_weight(rule_name):
+    rn = rule_name.lower()
+    if "mimikatz" in rn or "c2" in rn or "ransomware" in rn:
+        return 1.4
+    elif "port scan" in rn or "generic" in rn:
+        return 0.8
+    return 1.0
+
+def risk_event_score(modul, severity, sub_type, rule_name, rule_count):
+    # dup damping: rule yang sama berulang di IP yang sama tidak menumpuk linear
+    dup_damp = 1.0 / (1.0 + math.log(max(rule_count, 1)))
+    return (
+        risk_module_weight(modul) * risk_severity_weight(severity) *
+        risk_sub_type_weight(sub_type) * risk_rule_weight(rule_name) *
+        math.exp(-1) * dup_damp
+    )
+
+def finalize_risk_scores(ip_map, limit=5):
+    """
+    ip_map: {ip: {"event_count", "modul_set", "sub_type_set", "raw_score"}}
+    Return top-N IP dengan score 1 - 100 dan label severity.
+    """
+    results = []
+
+    # --- Step 5: Calculate final score ---
+    for ip, d in ip_map.items():
+
+        modul_count = len(d["modul_set"])
+        sub_type_count = len(d["sub_type_set"])
+
+        raw = d["raw_score"]
+
+        # koreksi modul & subtype
+        raw *= (1 + 0.2 * (modul_count - 1))
+        raw *= (1 + 0.1 * min(sub_type_count - 1, 3))
+
+        # normalisasi 1 - 100
+        score = max(1, min(100, raw * 2))
+
+        # severity label
+        if score >= 80:
+            sev = "Critical"
+        elif score >= 60:
+            sev = "High"
+        elif score >= 30:
+            sev = "Medium"
+        else:
+            sev = "Low"
+
+        results.append({
+            "ip": ip,
+            "event_count": d["event_count"],
+            "modul_count": modul_count,
+            "sub_type_count": sub_type_count,
+            "score": round(score, 2),
+            "severity": sev
+        })
+
+    # top N
+    return sorted(results, key=lambda x: x["score"], reverse=True)[:limit]
+
+def _new_ip_entry():
+    return {
+        "event_count": 0,
+        "modul_set": set(),
+        "sub_type_set": set(),
+        "raw_score": 0.0
+    }
+
+@timed_stage("risk_summary")
 def calculate_risk_summary(events):
 
     # --- Step 1: Base Extract ---
@@ -480,115 +741,187 @@ def calculate_risk_summary(events):
         key = (b["internal_ip"], b["rule_name"])
         rule_count_map[key] = rule_count_map.get(key, 0) + 1
 
-    # --- Step 3: Hitung score per event ---
-    scored = []
+    # --- Step 3 & 4: Hitung score per event lalu aggregate per IP ---
+    ip_map = defaultdict(_new_ip_entry)
 
     for b in base:
-        # modul weight
-        w_modul = {
-            "suricata": 1.0,
-            "panw": 1.2,
-            "sophos": 1.3
-        }.get(b["modul"], 1.0)
+        d = ip_map[b["internal_ip"]]
+        d["event_count"] += 1
+        d["modul_set"].add(b["modul"])
+        d["sub_type_set"].add(b["sub_type"])
+        d["raw_score"] += risk_event_score(
+            b["modul"],
+            b["severity"],
+            b["sub_type"],
+            b["rule_name"],
+            rule_count_map[(b["internal_ip"], b["rule_name"])]
+        )
 
-        # severity weight
-        w_severity = {
-            "critical": 5.0,
-            "severe": 5.0,
-            "high": 3.5,
-            "medium": 2.0,
-            "low": 1.0
-        }.get(b["severity"], 0.5)
+    return finalize_risk_scores(ip_map)
 
-        # subtype weight
-        sub = b["sub_type"]
-        if sub in ["malware","c2","command_and_control","data_exfil","exfiltration"]:
-            w_sub = 5.5
-        elif sub in ["exploit_attempt","exploit","intrusion","lateral_movement"]:
-            w_sub = 4.5
-        elif sub in ["auth_bruteforce","password_spray","credential_access"]:
-            w_sub = 3.8
-        elif sub in ["policy_violation","misconfiguration"]:
-            w_sub = 1.8
-        else:
-            w_sub = 1.0
 
-        # rule weight
-        rn = b["rule_name"].lower()
-        if "mimikatz" in rn or "c2" in rn or "ransomware" in rn:
-            w_rule = 1.4
-        elif "port scan" in rn or "generic" in rn:
-            w_rule = 0.8
-        else:
-            w_rule = 1.0
+# ------------------------------------------------------
+# Versi server-side: bucket agregasi, bukan satu objek per event
+# ------------------------------------------------------
 
-        # dup damping
-        rc = rule_count_map[(b["internal_ip"], b["rule_name"])]
-        dup_damp = 1.0 / (1.0 + math.log(max(rc, 1)))
+INTERNAL_CIDR = "192.168.0.0/16"
+# Bucket composite per halaman response (di bawah search.max_buckets default 65536)
+RISK_COMPOSITE_PAGE_SIZE = int(os.getenv("RISK_COMPOSITE_PAGE_SIZE", "10000"))
+# Halaman (round trip) per source & sisi; lebih dari ini → hasil ditandai partial
+RISK_MAX_PAGES = int(os.getenv("RISK_MAX_PAGES", "5"))
+RISK_SCORING_MODE = os.getenv("RISK_SCORING_MODE", "es")
 
-        scored.append({
-            "internal_ip": b["internal_ip"],
-            "modul": b["modul"],
-            "sub_type": b["sub_type"],
-            "event_score": w_modul * w_severity * w_sub * w_rule * math.exp(-1) * dup_damp
-        })
+_SRC_INTERNAL = {"term": {"source.ip": INTERNAL_CIDR}}
+_DST_INTERNAL = {"term": {"destination.ip": INTERNAL_CIDR}}
+# IP internal diambil dari source.ip dulu, baru destination.ip
+RISK_SIDES = {
+    "source.ip": _SRC_INTERNAL,
+    "destination.ip": {"bool": {"filter": [_DST_INTERNAL], "must_not": [_SRC_INTERNAL]}},
+}
+RISK_DIMENSIONS = (("rule", "description"), ("sub_type", "sub_type"), ("severity", "severity"))
 
-    # --- Step 4: Aggregate per IP ---
-    ip_map = {}
-
-    for s in scored:
-        ip = s["internal_ip"]
-        if ip not in ip_map:
-            ip_map[ip] = {
-                "event_count": 0,
-                "modul_set": set(),
-                "sub_type_set": set(),
-                "raw_score": 0.0
+def _risk_sources(source, ip_field):
+    """
+    Sumber composite: ip, lalu tiap path fallback rule / sub_type / severity
+    (.keyword) sebagai sumber terpisah dengan missing_bucket, supaya `a or b`
+    di normalizer bisa ditiru dari key bucket.
+    """
+    fields = SOURCE_FIELD_MAP[source]
+    sources = [{"ip": {"terms": {"field": ip_field}}}]
+    for name, field in RISK_DIMENSIONS:
+        for i, path in enumerate(fields[field]["paths"]):
+            sources.append({f"{name}_{i}": {"terms": {"field": path, "missing_bucket": True}}})
+    return sources
+
+def build_risk_query(source, timeframe, ip_field, after=None):
+    composite = {"size": RISK_COMPOSITE_PAGE_SIZE, "sources": _risk_sources(source, ip_field)}
+    if after:
+        composite["after"] = after
+    return {
+        "size": 0,
+        "query": {
+            "bool": {
+                "filter": [get_time_range_filter(timeframe), RISK_SIDES[ip_field]] + SOURCE_FILTERS[source]
             }
+        },
+        "aggs": {"groups": {"composite": composite}}
+    }
 
-        ip_map[ip]["event_count"] += 1
-        ip_map[ip]["modul_set"].add(s["modul"])
-        ip_map[ip]["sub_type_set"].add(s["sub_type"])
-        ip_map[ip]["raw_score"] += s["event_score"]
+def _risk_key_value(key, name, default=""):
+    # Nilai path pertama yang ada (fallback), seperti normalizer
+    i = 0
+    while f"{name}_{i}" in key:
+        value = key[f"{name}_{i}"]
+        if value is not None:
+            return str(value)
+        i += 1
+    return default
+
+class RiskGroups(list):
+    """
+    Hasil get_risk_groups: list (ip, modul, rule_name, sub_type, severity, count),
+    truncated=True kalau bucket melebihi RISK_MAX_PAGES halaman (top-N bisa bergeser).
+    """
 
-    results = []
+    def __init__(self, groups=(), truncated=False):
+        super().__init__(groups)
+        self.truncated = truncated
 
-    # --- Step 5: Calculate final score ---
-    for ip, d in ip_map.items():
-
-        modul_count = len(d["modul_set"])
-        sub_type_count = len(d["sub_type_set"])
+def get_risk_groups(source, es, index, timeframe, extra_filters=None):
+    """
+    Jalankan agregasi risk untuk satu source: composite (ip, rule, sub_type,
+    severity) dipaging dengan after_key, maksimal RISK_MAX_PAGES halaman per sisi.
+    Return RiskGroups.
+    """
+    rule_default = SOURCE_FIELD_MAP[source]["description"].get("default", "")
+
+    groups = defaultdict(int)
+    truncated = False
+    for ip_field in RISK_SIDES:
+        after = None
+        for _ in range(RISK_MAX_PAGES):
+            res = timed_search(
+                es, "risk_" + source, timeframe,
+                body=build_risk_query(source, timeframe, ip_field, after),
+                filter_path=["took", "aggregations.groups.after_key", "aggregations.groups.buckets"],
+                request_timeout=ELASTIC_AGG_TIMEOUT,
+                request_cache=True,
+                **index_params(index, timeframe)
+            )
+            agg = (res.get("aggregations") or {}).get("groups", {})
+            buckets = agg.get("buckets", [])
+            for bucket in buckets:
+                key = bucket["key"]
+                groups[(
+                    str(key["ip"]).split("/")[0],
+                    source,
+                    _risk_key_value(key, "rule", rule_default),
+                    _risk_key_value(key, "sub_type").lower(),
+                    _risk_key_value(key, "severity").lower()
+                )] += bucket["doc_count"]
+
+            after = agg.get("after_key")
+            if not after or len(buckets) < RISK_COMPOSITE_PAGE_SIZE:
+                break
+        else:
+            truncated = True
+            print(f"⚠️ risk {source} ({ip_field}): lebih dari {RISK_MAX_PAGES} halaman bucket, hasil partial")
 
-        raw = d["raw_score"]
+    return RiskGroups((key + (count,) for key, count in groups.items()), truncated)
 
-        # koreksi modul & subtype
-        raw *= (1 + 0.2 * (modul_count - 1))
-        raw *= (1 + 0.1 * min(sub_type_count - 1, 3))
-
-        # normalisasi 1 - 100
-        score = max(1, min(100, raw * 2))
+@timed_stage("risk_summary_es")
+def calculate_risk_summary_es(es, timeframe, limit=5, stale=None, partial_sources=None):
+    """
+    Top-N risk per IP internal dari agregasi Elasticsearch.
+    Formula sama persis dengan calculate_risk_summary, tapi dihitung dari
+    count bucket (ip → rule → sub_type → severity) atas seluruh event di
+    window, bukan dari 500 event pertama per source.
+    partial_sources (list, opsional): diisi source yang bucket-nya terpotong.
+    """
+    futures = [
+        (source, submit_with_context(
+            _source_pool, cached_fetch, "risk_" + source, partial(get_risk_groups, source), es, index, timeframe,
+            stale=stale
+        ))
+        for source, _, index in SOURCE_FETCHERS
+    ]
+    groups = []
+    for source, f in futures:
+        result = f.result()
+        groups.extend(result)
+        if getattr(result, "truncated", False) and partial_sources is not None:
+            partial_sources.append(source)
+
+    if not groups:
+        return []
 
-        # severity label
-        if score >= 80:
-            sev = "Critical"
-        elif score >= 60:
-            sev = "High"
-        elif score >= 30:
-            sev = "Medium"
-        else:
-            sev = "Low"
+    # rule count per (IP, rule) lintas source untuk dup_damp
+    rule_count_map = defaultdict(int)
+    for ip, _, rule_name, _, _, count in groups:
+        rule_count_map[(ip, rule_name)] += count
+
+    ip_map = defaultdict(_new_ip_entry)
+    for ip, modul, rule_name, sub_type, severity, count in groups:
+        d = ip_map[ip]
+        d["event_count"] += count
+        d["modul_set"].add(modul)
+        d["sub_type_set"].add(sub_type)
+        d["raw_score"] += count * risk_event_score(
+            modul, severity, sub_type, rule_name, rule_count_map[(ip, rule_name)]
+        )
 
-        results.append({
-            "ip": ip,
-            "event_count": d["event_count"],
-            "modul_count": modul_count,
-            "sub_type_count": sub_type_count,
-            "score": round(score, 2),
-            "severity": sev
-        })
+    return finalize_risk_scores(ip_map, limit)
 
-    # top 5
-    return sorted(results, key=lambda x: x["score"], reverse=True)[:5]
+def get_risk_summary_data(es, events, timeframe, stale=None, partial_sources=None):
+    if RISK_SCORING_MODE == "python":
+        return calculate_risk_summary(events)
+    try:
+        return calculate_risk_summary_es(es, timeframe, stale=stale, partial_sources=partial_sources)
+    except (TransportError, CircuitOpenError) as e:
+        # Agregasi gagal (mapping, max_buckets, timeout, circuit terbuka)
+        # → hitung dari event yang sudah diambil, /events/summary tetap jalan
+        print(f"⚠️ risk summary ES gagal, fallback ke Python: {e}")
+        return calculate_risk_summary(events)
 
 
 def calculate_global_stats(events, timeframe):
@@ -601,16 +934,10 @@ def calculate_global_stats(events, timeframe):
     # ----------------------------------------------------
     
     if timeframe == "today":
-        # Jika timeframe adalah "today", bagi total dengan 900
-        # per_second = round(total / 900, 2)
-        timeframe2 = "last1minutes"
-
-        suricata2 = get_suricata_events(es, INDEX, timeframe2) or []
-        sophos2 = get_sophos_events(es, INDEX, timeframe2) or []
-        panw2 = get_panw_events(es, INDEX_PANW, timeframe2) or []
-
-        combined2 = suricata2 + sophos2 + panw2
-        per_second = len(combined2)
+        # Rate event/detik dari sampler background (_count per source
+        # per interval), jadi tidak perlu query ulang semua source di sini
+        from .ingest_rate import ingest_rate_sampler
+        per_second = ingest_rate_sampler.get_total_rate()
     else:
         # Jika timeframe adalah selain "today", nilai per_second adalah 0
         per_second = 0 
@@ -663,10 +990,15 @@ def safe_parse_timestamp(ts):
         # Coba format lain jika perlu, atau kembalikan None jika gagal
         return None
 
-def build_timeline(events: list, timeframe: str) -> list:
-    # Mengambil waktu saat ini (UTC disarankan untuk konsistensi)
-    jakarta_tz = ZoneInfo("Asia/Jakarta")
-    now = datetime.now(tz=jakarta_tz)
+def get_timeline_window(timeframe: str):
+    """
+    Aturan interval timeline per timeframe.
+    Return (interval, time_format, start_time, now) atau None kalau
+    timeframe tidak punya timeline.
+    """
+    # Ujung window yang sudah dibulatkan (sama dengan range query), supaya
+    # extended_bounds juga stabil dan request timeline bisa di-cache
+    now = resolve_timeframe(timeframe).end
     
     # 1. Tentukan Granularitas, Format Output, dan Jangkauan Waktu
     
@@ -727,8 +1059,67 @@ def build_timeline(events: list, timeframe: str) -> list:
         
     else:
         # Fallback atau penanganan timeframe yang tidak dikenal
+        return None
+
+    return interval, time_format, start_time, now
+
+def add_timeline_agg(query: dict, timeframe: str):
+    """
+    Tambahkan date_histogram "timeline" ke query fetcher, dengan aturan
+    interval yang sama seperti build_timeline. Bucket kosong tetap muncul
+    (min_doc_count 0 + extended_bounds) sehingga tidak perlu diisi di Python.
+    """
+    window = get_timeline_window(timeframe)
+    if window is None:
+        return query
+
+    interval, _, start_time, now = window
+    interval_seconds = int(interval.total_seconds())
+
+    histogram = {
+        "field": "@timestamp",
+        "time_zone": "Asia/Jakarta",
+        # Semua bucket dimulai di menit genap, jadi HH:mm menghasilkan
+        # key yang sama dengan format Python (%H:%M / %H:00)
+        "format": "yyyy-MM-dd HH:mm",
+        "min_doc_count": 0,
+        "extended_bounds": {
+            "min": int(start_time.timestamp() * 1000),
+            "max": int(now.timestamp() * 1000)
+        }
+    }
+
+    if interval >= timedelta(days=1):
+        # Harian mengikuti tengah malam WIB
+        histogram["calendar_interval"] = "1d"
+    else:
+        histogram["fixed_interval"] = f"{interval_seconds}s"
+        # Geser batas bucket supaya sama dengan start_time build_timeline
+        offset = int(start_time.timestamp()) % interval_seconds
+        if offset:
+            histogram["offset"] = f"+{offset}s"
+
+    query.setdefault("aggs", {})["timeline"] = {"date_histogram": histogram}
+    return query
+
+def parse_timeline_agg(res: dict):
+    buckets = (res.get("aggregations") or {}).get("timeline", {}).get("buckets")
+    if buckets is None:
+        return None
+
+    return [
+        {"timeline": b["key_as_string"], "count": b["doc_count"]}
+        for b in buckets
+    ]
+
+@timed_stage("timeline")
+def build_timeline(events: list, timeframe: str) -> list:
+    window = get_timeline_window(timeframe)
+    if window is None:
         return []
 
+    interval, time_format, start_time, now = window
+
     # 2. Agregasi Event ke Interval Waktu
     
     # Inisialisasi dictionary untuk menyimpan hitungan: {timestamp_key: count}
@@ -787,41 +1178,91 @@ def build_timeline(events: list, timeframe: str) -> list:
 # FUNGSI UTAMA ANDA (TETAP SAMA, HANYA MENGGUNAKAN FUNGSI BUILD_TIMELINE BARU)
 # -------------------------------------------------------------------------
 
+def get_source_timeline(events, timeframe):
+    # Timeline dari date_histogram (dihitung Elasticsearch di request fetcher),
+    # fallback ke binning Python kalau tidak tersedia
+    timeline = getattr(events, "timeline", None)
+    if timeline is not None:
+        return timeline
+    return build_timeline(events, timeframe)
+
+def get_source_total(events, timeline):
+    # Total dari agregasi yang sama dengan timeline (semua dokumen di window),
+    # bukan len() list event yang dibatasi / per rule, supaya keduanya cocok
+    if timeline is not None and getattr(events, "timeline", None) is not None:
+        return sum(b["count"] for b in timeline)
+    return len(events)
+
 def build_event_type_stats(suricata, sophos, panw, timeframe):
-    return [
-        {
-            "event_type": "suricata",
-            "total": len(suricata),
-            "timeline": build_timeline(suricata, timeframe)
-        },
-        {
-            "event_type": "sophos",
-            "total": len(sophos),
-            "timeline": build_timeline(sophos, timeframe)
-        },
-        {
-            "event_type": "panw",
-            "total": len(panw),
-            "timeline": build_timeline(panw, timeframe)
-        }
-    ]
+    stats = []
+    for event_type, events in (("suricata", suricata), ("sophos", sophos), ("panw", panw)):
+        timeline = get_source_timeline(events, timeframe)
+        stats.append({
+            "event_type": event_type,
+            "total": get_source_total(events, timeline),
+            "timeline": timeline
+        })
+    return stats
+
+def build_summary(es, timeframe):
+    """
+    Payload lengkap /events/summary untuk satu timeframe
+    (tanpa status koneksi, yang diisi saat response dikirim).
+    """
+    stale = {}
+    suricata, sophos, panw = fetch_all_sources(es, timeframe, stale=stale)
+
+    combined = suricata + sophos + panw
+
+    risk_partial = []
+    summary = get_risk_summary_data(es, combined, timeframe, stale=stale, partial_sources=risk_partial)
+    global_stats = calculate_global_stats(combined, timeframe)
+    event_type_stats = build_event_type_stats(suricata, sophos, panw, timeframe)
+    event_type_ingest = build_event_type_ingest(suricata, sophos, panw, timeframe)
+    # Total global = jumlah total per source, semantik sama dengan list di bawahnya
+    total = sum(s["total"] for s in event_type_stats)
+
+    # 🔥 HITUNG MITRE
+    mitre_stats = calculate_mitre_stats(combined)
+    global_attack = calculate_global_attack(combined)
+
+    return {
+        "timeframe": timeframe,
+        "count": len(summary),
+        "summary": summary,
+        "mitre": mitre_stats,
+        "global_attack": global_attack,
+        "events": [
+            {
+                "total": total,
+                "seconds": global_stats["seconds"],
+                "list": event_type_stats
+            }
+        ],
+        "events_ingest": [
+            {
+                "total": total,
+                "seconds": global_stats["seconds"],
+                "list": event_type_ingest
+            }
+        ],
+        # Source yang dijawab dari hasil lama → {source: umur_detik}
+        "stale_sources": stale,
+        # Source yang bucket risk-nya melebihi RISK_MAX_PAGES → top-N belum tentu lengkap
+        "risk_partial_sources": risk_partial
+    }
 
 def build_event_type_ingest(suricata, sophos, panw, timeframe):
+    # Total sama dengan build_event_type_stats (dari timeline agregasi kalau ada)
     return [
         {
-            "event_type": "suricata",
-            "total": len(suricata)
-        },
-        {
-            "event_type": "sophos",
-            "total": len(sophos)
-        },
-        {
-            "event_type": "panw",
-            "total": len(panw)
+            "event_type": event_type,
+            "total": get_source_total(events, getattr(events, "timeline", None))
         }
+        for event_type, events in (("suricata", suricata), ("sophos", sophos), ("panw", panw))
     ]
 
+@timed_stage("global_attack")
 def calculate_global_attack(events):
     """
     Mengambil 5 event terbaru dengan severity 'Critical' atau 'High',
@@ -901,6 +1342,7 @@ def calculate_global_attack(events):
 # ----------------------------
 # 🔥 NEW FUNCTION – MITRE STATS
 # ----------------------------
+@timed_stage("mitre_stats")
 def calculate_mitre_stats(events):
     # total_events = len(events)
 
@@ -1004,33 +1446,213 @@ def calculate_mitre_stats(events):
     return result
 
 
-def build_dynamic_filters(filters: List[FilterItem]):
-    es_filters = []
+# ======================================================
+# FILTER PUSHDOWN: FilterItem / search_query → bool query
+# ======================================================
+
+# Mapping nama field hasil normalisasi → field ECS per source,
+# diturunkan dari SOURCE_MAPPINGS (app/extractors.py).
+# Tipe:
+#   "keyword" : term / wildcard (case-insensitive)
+#   "ip"      : field bertipe ip (tidak bisa wildcard)
+#   "number"  : bisa range
+#   "const"   : nilai tetap hasil normalizer, dievaluasi langsung
+# Field dengan beberapa path = fallback di normalizer (a or b).
+# "default" = nilai yang dipakai normalizer kalau semua path kosong.
+SOURCE_FIELD_MAP = build_field_map(SOURCE_MAPPINGS)
+
+SEARCHABLE_FIELDS = ["source_ip", "destination_ip", "country", "event_type", "severity"]
+
+MATCH_NONE = {"match_none": {}}
+
+_IP_CHARS = set("0123456789abcdef.:/")
+
+
+def _value_matches_python(op, event_value, value):
+    """Cerminan evaluate_condition untuk field konstanta."""
+    val_event = str(event_value).lower()
+    val_filter = str(value).lower()
+    if op == "is":
+        return val_event == val_filter
+    if op == "is_not":
+        return val_event != val_filter
+    if op == "contains":
+        return val_filter in val_event
+    if op == "exists":
+        return event_value is not None
+    return None
+
 
-    for f in filters:
+def _should(clauses):
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"bool": {"should": clauses, "minimum_should_match": 1}}
 
-        # Operator exact match
-        if f.operator == "is":
-            es_filters.append({"term": {f.field: f.value}})
 
-        # Operator wildcard (contains)
-        elif f.operator == "contains":
-            es_filters.append({"wildcard": {f.field: f"*{f.value}*"}})
+def build_filter_clause(source, field, op, value):
+    """
+    Terjemahkan satu kondisi filter menjadi clause Elasticsearch untuk satu source.
+
+    Return:
+      dict  → clause query
+      True  → kondisi pasti terpenuhi semua dokumen source ini
+      False → kondisi pasti tidak terpenuhi (source bisa di-skip)
+      None  → tidak bisa di-pushdown, cukup dicek di Python
+
+    Clause yang dihasilkan selalu superset dari hasil evaluate_condition
+    (tidak pernah membuang event yang lolos di Python), jadi filter Python
+    tetap dipakai sebagai pengecekan akhir.
+    """
+    spec = SOURCE_FIELD_MAP.get(source, {}).get(field)
+    if spec is None:
+        return None
 
-        # Prefix match
-        elif f.operator == "starts_with":
-            es_filters.append({"prefix": {f.field: f.value}})
+    if spec["type"] == "const":
+        return _value_matches_python(op, spec["value"], value)
 
-        # Range gte
-        elif f.operator == "gte":
-            es_filters.append({"range": {f.field: {"gte": f.value}}})
+    paths = spec["paths"]
+    val = str(value).lower() if value is not None else ""
+    default = spec.get("default")
 
-        # Range lte
-        elif f.operator == "lte":
-            es_filters.append({"range": {f.field: {"lte": f.value}}})
+    # Field kosong di normalizer jadi None → str(None) = "none" di Python,
+    # kasus ini tidak bisa direpresentasikan di ES
+    empty_values = ["none"] + ([default] if default else [])
 
-        # IP CIDR match
-        elif f.operator == "cidr":
-            es_filters.append({"term": {f.field: f.value}})
+    if op == "exists":
+        if default:
+            return True
+        return _should([{"exists": {"field": p}} for p in paths])
+
+    if op == "is":
+        if val == "" or val in empty_values:
+            return None
+        if spec["type"] == "ip":
+            try:
+                ipaddress.ip_address(val)
+            except ValueError:
+                return None
+            return _should([{"term": {p: val}} for p in paths])
+        if spec["type"] == "number":
+            try:
+                num = float(val)
+            except ValueError:
+                return None
+            return _should([{"term": {p: num}} for p in paths])
+        return _should([
+            {"term": {p: {"value": value, "case_insensitive": True}}}
+            for p in paths
+        ])
+
+    if op == "is_not":
+        # Dengan fallback, dokumen yang field pertamanya beda tapi fallback-nya
+        # sama tetap lolos di Python → tidak aman di-negasikan di ES
+        if len(paths) > 1 or default:
+            return None
+        if spec["type"] == "ip":
+            try:
+                ipaddress.ip_address(val)
+            except ValueError:
+                return True
+            return {"bool": {"must_not": [{"term": {paths[0]: val}}]}}
+        if spec["type"] == "number":
+            return None
+        return {"bool": {"must_not": [
+            {"term": {paths[0]: {"value": value, "case_insensitive": True}}}
+        ]}}
+
+    if op == "contains":
+        if any(val in empty for empty in empty_values):
+            return None
+        if spec["type"] == "ip":
+            # IP hanya berisi hex/angka/titik/titik dua → kata lain pasti tidak cocok
+            if set(val) - _IP_CHARS:
+                return False
+            return None
+        if spec["type"] == "number":
+            return None
+        escaped = re.sub(r"([*?\\])", r"\\\1", val)
+        return _should([
+            {"wildcard": {p: {"value": f"*{escaped}*", "case_insensitive": True}}}
+            for p in paths
+        ])
+
+    if op in (">", "<"):
+        if spec["type"] != "number":
+            return None
+        try:
+            num = float(value)
+        except (TypeError, ValueError):
+            return False
+        key = "gt" if op == ">" else "lt"
+        return _should([{"range": {p: {key: num}}} for p in paths])
+
+    return None
+
+
+def _combine(clauses, logic):
+    """Gabungkan hasil build_filter_clause dengan logika AND / OR."""
+    if logic == "OR":
+        parts = []
+        for c in clauses:
+            if c is None or c is True:
+                # Satu kondisi tidak bisa dipastikan → seluruh OR tidak bisa dipersempit
+                return True
+            if c is False:
+                continue
+            parts.append(c)
+        if not parts:
+            return False
+        return _should(parts)
+
+    parts = []
+    for c in clauses:
+        if c is False:
+            return False
+        if c is None or c is True:
+            continue
+        parts.append(c)
+    if not parts:
+        return True
+    return {"bool": {"filter": parts}} if len(parts) > 1 else parts[0]
 
-    return es_filters
\ No newline at end of file
+
+def build_dynamic_filters(source, filters=None, logic="AND", search_query=None):
+    """
+    Bangun list clause untuk bool.filter query satu source dari FilterItem
+    (AND/OR) dan search_query (contains di SEARCHABLE_FIELDS).
+
+    Return None kalau kombinasi filter pasti tidak cocok dengan source ini,
+    sehingga query ke Elasticsearch bisa dilewati.
+    """
+    logic = (logic or "AND").upper()
+    es_filters = []
+
+    if filters:
+        combined = _combine(
+            [build_filter_clause(source, f.field, f.operator, f.value) for f in filters],
+            logic
+        )
+        if combined is False:
+            return None
+        if combined is not True:
+            es_filters.append(combined)
+
+    if search_query:
+        combined = _combine(
+            [build_filter_clause(source, field, "contains", search_query) for field in SEARCHABLE_FIELDS],
+            "OR"
+        )
+        if combined is False:
+            return None
+        if combined is not True:
+            es_filters.append(combined)
+
+    return es_filters
+
+
+def build_source_filters(filters=None, logic="AND", search_query=None):
+    """build_dynamic_filters untuk semua source: {source: list clause | None}."""
+    return {
+        source: build_dynamic_filters(source, filters, logic, search_query)
+        for source in SOURCE_FIELD_MAP
+    }
@@ -0,0 +1,126 @@
+# app/tail.py
+import math
+import time
+
+from .metrics import timed_search
+from .services import SOURCE_FILTERS, SOURCE_INDEX, SOURCE_INCLUDES, HIT_NORMALIZERS
+
+TAIL_BATCH_SIZE = 500
+TAIL_MAX_BATCHES = 10
+TAIL_FILTER_PATH = ["took", "hits.hits._source", "hits.hits.sort"]
+
+
+class TailCursor:
+    """
+    Watermark per source untuk membaca hanya dokumen baru.
+
+    Dokumen diurutkan (@timestamp, _index, _seq_no) naik; posisi terakhir
+    yang sudah dibaca disimpan sebagai sort values hit terakhir dan dipakai
+    sebagai search_after. _seq_no unik per shard (backing index data stream
+    default 1 primary shard), jadi berapa pun dokumen di milidetik yang sama
+    tetap terbaca habis tanpa dobel. Tiebreaker-nya sengaja bukan _id:
+    sort _id memuat fielddata _id ke heap (deprecated di 7.x, ditolak di 8.x),
+    sedangkan _index & _seq_no dari doc values.
+
+    Catatan: dokumen yang baru ter-index setelah posisinya dilewati
+    (timestamp <= watermark) tidak ikut terbaca, sama seperti watermark biasa.
+    """
+
+    def __init__(self, source, start_ms=None):
+        self.source = source
+        self.index = SOURCE_INDEX[source]
+        self.normalize = HIT_NORMALIZERS[source]
+        self.start_ms = start_ms if start_ms is not None else int(time.time() * 1000)
+        self.after = None
+
+    @property
+    def watermark_ms(self):
+        """@timestamp (epoch ms) dokumen terakhir yang sudah dibaca."""
+        return int(float(self.after[0])) if self.after else self.start_ms
+
+    def _query(self, extra_filters=None):
+        query = {
+            "size": TAIL_BATCH_SIZE,
+            "query": {
+                "bool": {
+                    "filter": [
+                        # gte watermark hanya mempersempit; posisi persisnya dari search_after
+                        {"range": {"@timestamp": {
+                            "gte": self.watermark_ms,
+                            "format": "epoch_millis"
+                        }}}
+                    ] + SOURCE_FILTERS[self.source] + (extra_filters or [])
+                }
+            },
+            "_source": SOURCE_INCLUDES[self.source],
+            "sort": [
+                {"@timestamp": {"order": "asc", "format": "epoch_millis"}},
+                {"_index": {"order": "asc"}},
+                {"_seq_no": {"order": "asc"}}
+            ],
+            "track_total_hits": False
+        }
+        if self.after:
+            query["search_after"] = self.after
+        return query
+
+    def backfill(self, es, limit):
+        """
+        Isi awal: maksimal limit dokumen terbaru sejak start_ms, dibaca dari
+        yang terbaru mundur (paling banyak ceil(limit / TAIL_BATCH_SIZE) batch),
+        lalu posisi cursor diset ke dokumen terbaru. Memori & trafik
+        dibatasi limit, berapa pun panjang window-nya.
+        Return list (timestamp_ms, event ternormalisasi), urut naik.
+        """
+        query = self._query()
+        query["sort"] = [
+            {"@timestamp": {"order": "desc", "format": "epoch_millis"}},
+            {"_index": {"order": "desc"}},
+            {"_seq_no": {"order": "desc"}}
+        ]
+        results = []
+
+        for _ in range(math.ceil(limit / TAIL_BATCH_SIZE)):
+            query["size"] = min(TAIL_BATCH_SIZE, limit - len(results))
+            res = timed_search(
+                es, self.source, "tail",
+                index=self.index, body=query, filter_path=TAIL_FILTER_PATH
+            )
+            hits = res.get("hits", {}).get("hits", [])
+            if hits and self.after is None:
+                # Sort values dokumen terbaru = titik lanjut fetch_new (urutan naik)
+                self.after = hits[0]["sort"]
+
+            for h in hits:
+                results.append((int(float(h["sort"][0])), self.normalize(h.get("_source", {}))))
+            if len(hits) < query["size"] or len(results) >= limit:
+                break
+            query["search_after"] = hits[-1]["sort"]
+
+        results.reverse()
+        return results
+
+    def fetch_new(self, es, extra_filters=None, max_batches=TAIL_MAX_BATCHES):
+        """
+        Ambil dokumen baru sejak posisi terakhir (urut naik), majukan posisi.
+        Return list (timestamp_ms, event ternormalisasi).
+        """
+        results = []
+
+        for _ in range(max_batches):
+            res = timed_search(
+                es, self.source, "tail",
+                index=self.index, body=self._query(extra_filters), filter_path=TAIL_FILTER_PATH
+            )
+            hits = res.get("hits", {}).get("hits", [])
+
+            for h in hits:
+                results.append((int(float(h["sort"][0])), self.normalize(h.get("_source", {}))))
+            if hits:
+                self.after = hits[-1]["sort"]
+
+            # Batch tidak penuh = sudah sampai ujung
+            if len(hits) < TAIL_BATCH_SIZE:
+                break
+
+        return results
@@ -0,0 +1,164 @@
+# app/timeframe.py
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+TIMEZONE = ZoneInfo("Asia/Jakarta")
+
+# Batas window dibulatkan ke satuan ini (s | m | h | d), supaya query yang
+# sama dalam satu menit identik byte-per-byte → kena shard request cache.
+TIMEFRAME_ROUNDING = os.getenv("TIMEFRAME_ROUNDING", "m")
+# absolute : epoch_millis hasil pembulatan di sini (default; tanpa "now",
+#            jadi request aggregasi size 0 bisa di-cache Elasticsearch)
+# datemath : "now-24h/m" .. "now/m", dihitung oleh Elasticsearch
+TIMEFRAME_BOUNDS = os.getenv("TIMEFRAME_BOUNDS", "absolute").lower()
+
+DEFAULT_WINDOW = timedelta(days=1)
+
+UNITS = {
+    "s": timedelta(seconds=1),
+    "m": timedelta(minutes=1),
+    "h": timedelta(hours=1),
+    "d": timedelta(days=1),
+}
+_UNIT_NAMES = {"seconds": "s", "minutes": "m", "hours": "h", "days": "d"}
+_RELATIVE = re.compile(r"(?:last)?(\d{1,4})(seconds|minutes|hours|days)")
+# Window absolut "<start_ms>..<end_ms>" (mis. window yang dibekukan di cursor paginasi)
+_ABSOLUTE = re.compile(r"(\d{1,15})\.\.(\d{1,15})")
+
+# Nama lama yang artinya tidak sama dengan bentuk umumnya
+LEGACY_WINDOWS = {
+    # Window "per detik" terbaru
+    "last1minutes": timedelta(seconds=5),
+    "1minutes": timedelta(seconds=5),
+    "last1seconds": timedelta(seconds=5),
+    "1seconds": timedelta(seconds=5),
+    # 24 jam bergulir, bukan hari kalender kemarin
+    "yesterday": timedelta(days=1),
+}
+
+
+def parse_timeframe(timeframe):
+    """
+    Durasi window untuk timeframe: nama lama (today, yesterday, last1minutes)
+    atau bentuk relatif last<N><seconds|minutes|hours|days> / <N><unit>.
+    Return timedelta, "today", atau None kalau tidak dikenal.
+    """
+    if timeframe == "today":
+        return "today"
+    if timeframe in LEGACY_WINDOWS:
+        return LEGACY_WINDOWS[timeframe]
+    match = _RELATIVE.fullmatch(timeframe or "")
+    if match is None:
+        return None
+    amount, unit = int(match.group(1)), _UNIT_NAMES[match.group(2)]
+    return amount * UNITS[unit] if amount else None
+
+
+def is_absolute_timeframe(timeframe):
+    return isinstance(timeframe, str) and _ABSOLUTE.fullmatch(timeframe) is not None
+
+
+def _floor(dt, unit):
+    if unit == "d":
+        return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    step = int(UNITS[unit].total_seconds())
+    return datetime.fromtimestamp(int(dt.timestamp()) // step * step, tz=dt.tzinfo)
+
+
+def _rounding_for(duration, rounding):
+    # Window pendek (mis. 5 detik) tidak boleh melebar karena pembulatan
+    if rounding not in UNITS:
+        rounding = "m"
+    while rounding != "s" and duration < 10 * UNITS[rounding]:
+        rounding = {"d": "h", "h": "m", "m": "s"}[rounding]
+    return rounding
+
+
+def _datemath(duration):
+    seconds = int(duration.total_seconds())
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+
+class TimeWindow:
+    """
+    Window waktu hasil resolve satu timeframe. Dipakai bersama oleh query
+    Elasticsearch (range_filter) dan statistik di Python (start/end),
+    jadi keduanya selalu melihat window yang sama.
+
+    start / end : datetime aware (Asia/Jakarta); end inklusif (ms terakhir)
+    """
+
+    __slots__ = ("timeframe", "start", "end", "rounding", "_gte", "_lte")
+
+    def __init__(self, timeframe, start, end, rounding, gte=None, lte=None):
+        self.timeframe = timeframe
+        self.start = start
+        self.end = end
+        self.rounding = rounding
+        self._gte = gte
+        self._lte = lte
+
+    @property
+    def start_ms(self):
+        return round(self.start.timestamp() * 1000)
+
+    @property
+    def end_ms(self):
+        return round(self.end.timestamp() * 1000)
+
+    @property
+    def absolute_timeframe(self):
+        """Timeframe "<start_ms>..<end_ms>": resolve ulang selalu ke window ini."""
+        return f"{self.start_ms}..{self.end_ms}"
+
+    def range_filter(self, absolute=None):
+        """
+        Clause range @timestamp. absolute=True memaksa epoch_millis (mis. cursor
+        paginasi yang harus tetap sama antar halaman).
+        """
+        if absolute is None:
+            absolute = TIMEFRAME_BOUNDS != "datemath"
+        if absolute or self._gte is None:
+            bounds = {"gte": self.start_ms, "lte": self.end_ms, "format": "epoch_millis"}
+        else:
+            bounds = {"gte": self._gte, "lte": self._lte}
+            if self.rounding == "d":
+                bounds["time_zone"] = "Asia/Jakarta"
+        return {"range": {"@timestamp": bounds}}
+
+
+def resolve_timeframe(timeframe, now=None, rounding=TIMEFRAME_ROUNDING):
+    """Timeframe → TimeWindow (timeframe tidak dikenal = 24 jam terakhir)."""
+    absolute = _ABSOLUTE.fullmatch(timeframe or "")
+    if absolute:
+        start, end = (
+            datetime.fromtimestamp(int(ms) // 1000, tz=TIMEZONE) + timedelta(milliseconds=int(ms) % 1000)
+            for ms in absolute.groups()
+        )
+        return TimeWindow(timeframe, start, end, "s")
+
+    now = now or datetime.now(tz=TIMEZONE)
+    duration = parse_timeframe(timeframe)
+
+    if duration == "today":
+        # Mulai jam 00:00 UTC pada tanggal hari ini (WIB), seperti sebelumnya
+        start = datetime(now.year, now.month, now.day, tzinfo=timezone.utc).astimezone(TIMEZONE)
+        unit = _rounding_for(now - start, rounding) if now > start else "s"
+        end = _floor(now, unit) + UNITS[unit] - timedelta(milliseconds=1)
+        return TimeWindow(timeframe, start, end, unit)
+
+    duration = duration or DEFAULT_WINDOW
+    unit = _rounding_for(duration, rounding)
+    start = _floor(now - duration, unit)
+    # lte "now/m" di Elasticsearch dibulatkan ke atas: ms terakhir menit berjalan
+    end = _floor(now, unit) + UNITS[unit] - timedelta(milliseconds=1)
+    return TimeWindow(
+        timeframe, start, end, unit,
+        gte=f"now-{_datemath(duration)}/{unit}",
+        lte=f"now/{unit}"
+    )
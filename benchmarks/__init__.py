@@ -0,0 +1,17 @@
+"""
+Benchmark Threat Analytics API.
+
+Skrip mandiri (hitung sekali, cetak ringkasan):
+
+    python -m benchmarks.payload_size
+    python -m benchmarks.serialization
+
+Suite pytest-benchmark dengan data sintetis & Elasticsearch palsu in-process
+(tanpa cluster):
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks
+    BENCH_SIZES=1000,100000,1000000 python -m pytest benchmarks
+    python -m pytest benchmarks --benchmark-autosave     # simpan baseline
+    python -m pytest benchmarks --benchmark-compare      # bandingkan dengan baseline terakhir
+"""
@@ -0,0 +1,47 @@
+# benchmarks/bench_endpoints.py
+"""
+Endpoint end-to-end lewat TestClient (routing, fan-out, query ke fake_es,
+normalisasi, agregasi, serialisasi). extra_info mencatat took ES rata-rata.
+"""
+from benchmarks.conftest import INTERNAL_HEADERS, run_pedantic
+
+
+def bench_summary(benchmark, client, fake_es):
+    res = run_pedantic(benchmark, fake_es, lambda: client.post(
+        "/api/threats/events/summary", json={"timeframe": "last24hours"}, headers=INTERNAL_HEADERS
+    ))
+    assert res.status_code == 200, res.text
+
+
+def bench_filter(benchmark, client, fake_es):
+    res = run_pedantic(benchmark, fake_es, lambda: client.post(
+        "/api/threats/events/filter", json={"timeframe": "last24hours"}, headers=INTERNAL_HEADERS
+    ))
+    assert res.status_code == 200, res.text
+    benchmark.extra_info["events"] = res.json()["count"]
+
+
+def bench_filter_pushdown(benchmark, client, fake_es):
+    body = {
+        "timeframe": "last24hours",
+        "filters": [{"field": "severity", "operator": "is", "value": "High"}],
+    }
+    res = run_pedantic(benchmark, fake_es, lambda: client.post(
+        "/api/threats/events/filter", json=body, headers=INTERNAL_HEADERS
+    ))
+    assert res.status_code == 200, res.text
+    benchmark.extra_info["events"] = res.json()["count"]
+
+
+def bench_filter_top100(benchmark, client, fake_es):
+    """100 event terbaru yang lolos filter: merge berhenti setelah 100 event."""
+    body = {
+        "timeframe": "last24hours",
+        "filters": [{"field": "severity", "operator": "is", "value": "High"}],
+        "limit": 100,
+    }
+    res = run_pedantic(benchmark, fake_es, lambda: client.post(
+        "/api/threats/events/filter", json=body, headers=INTERNAL_HEADERS
+    ))
+    assert res.status_code == 200, res.text
+    benchmark.extra_info["events"] = res.json()["count"]
@@ -0,0 +1,107 @@
+# benchmarks/bench_stages.py
+"""
+Tahap-tahap pipeline secara terpisah:
+- fetch + normalisasi per source terhadap response ES yang sudah jadi
+  (biaya ES tidak ikut, hanya parse hasil & bikin Event)
+- agregasi Python (risk, timeline, global attack, MITRE) atas N event
+- bentuk query contoh event Suricata (top_hits vs collapse)
+- resolve backing index setelah rollover di antara dua refresh
+"""
+import time
+
+import pytest
+
+from app import services
+from app.elastic_client import elastic_manager
+from app.index_resolver import BackingIndexResolver
+from app.services import (
+    INDEX, INDEX_PANW,
+    build_timeline, calculate_global_attack, calculate_mitre_stats, calculate_risk_summary,
+    get_panw_events, get_sophos_events, get_suricata_events,
+)
+from benchmarks.conftest import run_pedantic
+from benchmarks.fake_es import FakeElasticsearch
+from benchmarks.generator import generate_documents
+
+FETCHERS = {
+    "suricata": (get_suricata_events, INDEX),
+    "sophos": (get_sophos_events, INDEX),
+    "panw": (get_panw_events, INDEX_PANW),
+}
+
+
+class CannedES:
+    """Search pertama diteruskan ke fake_es, berikutnya memakai response yang sama."""
+
+    def __init__(self, es):
+        self.es = es
+        self.response = None
+
+    def search(self, **kwargs):
+        if self.response is None:
+            self.response = self.es.search(**kwargs)
+        return self.response
+
+
+@pytest.mark.parametrize("source", list(FETCHERS))
+def bench_fetch_normalize(benchmark, fake_es, source):
+    fetcher, index = FETCHERS[source]
+    canned = CannedES(fake_es)
+    result = benchmark(fetcher, canned, index, "last24hours")
+    benchmark.extra_info["events"] = len(result)
+
+
+def bench_risk_summary(benchmark, events):
+    benchmark(calculate_risk_summary, events)
+
+
+def bench_timeline(benchmark, events):
+    benchmark(build_timeline, events, "last24hours")
+
+
+def bench_global_attack(benchmark, events):
+    benchmark(calculate_global_attack, events)
+
+
+def bench_mitre_stats(benchmark, events):
+    benchmark(calculate_mitre_stats, events)
+
+
+@pytest.mark.parametrize("sample_mode", ["top_hits", "collapse"])
+def bench_suricata_sample_shape(benchmark, fake_es, monkeypatch, sample_mode):
+    """
+    Contoh event per rule: top_hits per bucket vs collapse. Bandingkan
+    extra_info es_took_ms & es_response_bytes; took fake_es hanya kasar,
+    angka cluster sebenarnya dari threat_api_es_took_seconds di /metrics.
+    """
+    monkeypatch.setattr(services, "SURICATA_SAMPLE_MODE", sample_mode)
+    result = run_pedantic(
+        benchmark, fake_es, lambda: get_suricata_events(fake_es, INDEX, "last24hours")
+    )
+    benchmark.extra_info["events"] = len(result)
+
+
+def bench_resolve_after_rollover(benchmark, monkeypatch):
+    """
+    Rollover terjadi setelah refresh terakhir resolver: generation baru belum
+    ada di cache, tapi ekspresi hasil resolve harus tetap mencakupnya
+    (jumlah dokumen sama dengan query ke pola asli).
+    """
+    now_ms = int(time.time() * 1000)
+    docs = generate_documents(4000, now_ms=now_ms, rollover_hours=6)
+    newest = max(index for _, index, _, _ in docs if index.startswith(".ds-logs-panw"))
+
+    resolver = BackingIndexResolver()
+    monkeypatch.setattr(elastic_manager, "_client", FakeElasticsearch([d for d in docs if d[1] != newest]))
+    resolver.refresh(INDEX_PANW)
+    assert newest not in resolver._states[INDEX_PANW].indices
+
+    es = FakeElasticsearch(docs)
+    start_ms = now_ms - 3600 * 1000
+    index = benchmark(resolver.resolve, INDEX_PANW, start_ms, now_ms)
+
+    query = {"query": {"range": {"@timestamp": {"gte": start_ms, "lte": now_ms, "format": "epoch_millis"}}}}
+    expected = es.count(index=INDEX_PANW, body=query)["count"]
+    assert expected > 0
+    assert index != INDEX_PANW
+    assert es.count(index=index, body=query)["count"] == expected
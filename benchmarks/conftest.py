@@ -0,0 +1,69 @@
+# benchmarks/conftest.py
+import os
+
+import pytest
+
+# Index harus ada sebelum app.services di-import (dibaca saat import)
+os.environ.setdefault("ELASTIC_INDEX", "logs-generic-*")
+
+from benchmarks.fake_es import FakeElasticsearch  # noqa: E402
+from benchmarks.generator import generate_documents  # noqa: E402
+
+# Jumlah dokumen per skenario; 1 juta opt-in: BENCH_SIZES=1000,100000,1000000
+BENCH_SIZES = [int(n) for n in os.getenv("BENCH_SIZES", "1000,100000").split(",") if n.strip()]
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "5"))
+
+INTERNAL_HEADERS = {"X-Internal-Service-Key": "RAHASIA_SANGAT_KUAT"}
+
+
+@pytest.fixture(scope="session", params=BENCH_SIZES, ids=lambda n: f"{n}docs")
+def corpus(request):
+    return generate_documents(request.param)
+
+
+@pytest.fixture(scope="session")
+def fake_es(corpus):
+    return FakeElasticsearch(corpus)
+
+
+@pytest.fixture(scope="session")
+def events(corpus):
+    """Seluruh corpus dalam bentuk Event (input fungsi agregasi Python)."""
+    from app.services import HIT_NORMALIZERS, SOURCE_INCLUDES
+    from benchmarks.fake_es import apply_source_filter
+
+    result = []
+    for _, _, _, src in corpus:
+        source = src["event"]["module"]
+        result.append(HIT_NORMALIZERS[source](apply_source_filter(src, SOURCE_INCLUDES[source])))
+    return result
+
+
+@pytest.fixture
+def client(fake_es, monkeypatch):
+    """
+    TestClient tanpa startup event (tanpa health check, sampler, materializer),
+    cache dimatikan supaya setiap request benar-benar query ke fake_es.
+    """
+    from fastapi.testclient import TestClient
+
+    from app import cache
+    from app.elastic_client import elastic_manager
+    from app.materializer import summary_materializer
+    from main import app
+
+    monkeypatch.setattr(elastic_manager, "_client", fake_es)
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(summary_materializer, "get_snapshot", lambda timeframe: None)
+    return TestClient(app)
+
+
+def run_pedantic(benchmark, fake_es, fn):
+    """benchmark.pedantic + rata-rata took, jumlah search & byte response fake_es per panggilan."""
+    took, searches, size = fake_es.took_ms, fake_es.searches, fake_es.response_bytes
+    result = benchmark.pedantic(fn, rounds=BENCH_ROUNDS, warmup_rounds=1)
+    calls = BENCH_ROUNDS + 1
+    benchmark.extra_info["es_took_ms"] = round((fake_es.took_ms - took) / calls, 2)
+    benchmark.extra_info["es_searches"] = (fake_es.searches - searches) / calls
+    benchmark.extra_info["es_response_bytes"] = (fake_es.response_bytes - size) // calls
+    return result
@@ -0,0 +1,674 @@
+# benchmarks/fake_es.py
+"""
+Pengganti Elasticsearch in-process untuk benchmark.
+
+Menjawab bentuk query & agregasi yang dipakai app/ (bool/term/terms/range/
+wildcard/exists, CIDR pada field ip, case_insensitive; terms/composite/
+filter/top_hits/min/max/date_histogram; size+sort+search_after, collapse,
+PIT, _count, _source includes, filter_path). Response di-encode/decode JSON sekali
+supaya biaya parse di sisi client ikut terukur.
+
+Bukan implementasi lengkap: cukup untuk query yang dihasilkan service ini.
+"""
+import bisect
+import fnmatch
+import ipaddress
+import itertools
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import orjson
+
+_UNIT_MS = {"s": 1000, "m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 7 * 86_400_000}
+_DATE_MATH = re.compile(r"([+-])(\d+)([smhdw])")
+_BACKING_INDEX = re.compile(r"-\d{4}\.\d{2}\.\d{2}-\d{6}$")
+
+
+# ======================================================
+# _source includes & filter_path
+# ======================================================
+
+def apply_source_filter(src, spec):
+    """_source: True/False/list include/{"includes": [...]}."""
+    if spec is None or spec is True:
+        return src
+    if spec is False:
+        return None
+    paths = spec.get("includes", []) if isinstance(spec, dict) else spec
+    if isinstance(paths, str):
+        paths = [paths]
+    out = {}
+    for path in paths:
+        keys = path.split(".")
+        node = src
+        for key in keys:
+            if not isinstance(node, dict) or key not in node:
+                break
+            node = node[key]
+        else:
+            target = out
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = node
+    return out
+
+
+def apply_filter_path(obj, paths):
+    """filter_path sederhana (tanpa wildcard): bagian kosong ikut hilang seperti di ES."""
+    if isinstance(paths, str):
+        paths = paths.split(",")
+    split = [p.split(".") for p in paths]
+
+    def walk(node, prefixes):
+        if any(not p for p in prefixes):
+            return node
+        if isinstance(node, list):
+            items = [walk(item, prefixes) for item in node]
+            items = [i for i in items if i is not None]
+            return items or None
+        if not isinstance(node, dict):
+            return None
+        out = {}
+        for key, value in node.items():
+            rest = [p[1:] for p in prefixes if p[0] == key]
+            if rest:
+                kept = walk(value, rest)
+                if kept is not None:
+                    out[key] = kept
+        return out or None
+
+    return walk(obj, split) or {}
+
+
+# ======================================================
+# FIELD & TANGGAL
+# ======================================================
+
+_getters = {}
+
+
+def field_getter(path):
+    """Getter nilai field (selalu list, mendukung field multi-value & .keyword)."""
+    getter = _getters.get(path)
+    if getter is not None:
+        return getter
+
+    keys = path.split(".")
+    if keys[-1] == "keyword":
+        keys = keys[:-1]
+
+    def get(src):
+        node = src
+        for key in keys:
+            if not isinstance(node, dict):
+                return []
+            node = node.get(key)
+            if node is None:
+                return []
+        return node if isinstance(node, list) else [node]
+
+    _getters[path] = get
+    return get
+
+
+def parse_date(value, now_ms, round_up=False):
+    """epoch ms dari ISO / epoch_millis / date math (now-24h/m)."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value)
+    if value.isdigit():
+        return int(value)
+    if value.startswith("now"):
+        expr, _, rounding = value[3:].partition("/")
+        ms = now_ms
+        for sign, amount, unit in _DATE_MATH.findall(expr):
+            delta = int(amount) * _UNIT_MS[unit]
+            ms = ms + delta if sign == "+" else ms - delta
+        if rounding:
+            unit = _UNIT_MS[rounding]
+            ms = ms - ms % unit
+            if round_up:
+                ms += unit - 1
+        return ms
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+def format_date(ms, pattern=None, tz=timezone.utc):
+    dt = datetime.fromtimestamp(ms / 1000, tz=tz)
+    if pattern is None:
+        return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ms % 1000:03d}Z"
+    for java, py in (("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S")):
+        pattern = pattern.replace(java, py)
+    return dt.strftime(pattern)
+
+
+def _interval_ms(spec):
+    match = re.fullmatch(r"([+-]?\d+)([smhdw])", spec)
+    return int(match.group(1)) * _UNIT_MS[match.group(2)]
+
+
+# ======================================================
+# QUERY → PREDIKAT
+# ======================================================
+
+class _Doc:
+    __slots__ = ("ts", "seq", "index", "id", "src")
+
+    def __init__(self, ts, seq, index, doc_id, src):
+        self.ts = ts
+        self.seq = seq
+        self.index = index
+        self.id = doc_id
+        self.src = src
+
+
+def _term_value(spec):
+    if isinstance(spec, dict):
+        return spec.get("value"), spec.get("case_insensitive", False)
+    return spec, False
+
+
+def compile_query(query, now_ms):
+    """Query DSL → fungsi predikat(_Doc)."""
+    if not query or "match_all" in query:
+        return lambda d: True
+    if "match_none" in query:
+        return lambda d: False
+
+    if "bool" in query:
+        b = query["bool"]
+        required = [compile_query(q, now_ms) for q in b.get("filter", []) + b.get("must", [])]
+        excluded = [compile_query(q, now_ms) for q in b.get("must_not", [])]
+        should = [compile_query(q, now_ms) for q in b.get("should", [])]
+        msm = b.get("minimum_should_match", 0 if required else 1) if should else 0
+
+        def pred(d):
+            for p in required:
+                if not p(d):
+                    return False
+            for p in excluded:
+                if p(d):
+                    return False
+            if msm:
+                return sum(1 for p in should if p(d)) >= msm
+            return True
+        return pred
+
+    if "term" in query:
+        (field, spec), = query["term"].items()
+        value, ci = _term_value(spec)
+        if field == "_index":
+            return lambda d: d.index == value
+        get = field_getter(field)
+        if isinstance(value, str) and "/" in value and field.endswith(".ip"):
+            network = ipaddress.ip_network(value, strict=False)
+
+            def in_network(d):
+                for v in get(d.src):
+                    try:
+                        if ipaddress.ip_address(str(v).split("/")[0]) in network:
+                            return True
+                    except ValueError:
+                        pass
+                return False
+            return in_network
+        if ci and isinstance(value, str):
+            lowered = value.lower()
+            return lambda d: any(str(v).lower() == lowered for v in get(d.src))
+        return lambda d: any(v == value or str(v) == str(value) for v in get(d.src))
+
+    if "terms" in query:
+        (field, values), = ((k, v) for k, v in query["terms"].items() if k != "boost")
+        get = field_getter(field)
+        wanted = set(values) | {str(v) for v in values}
+        return lambda d: any(v in wanted or str(v) in wanted for v in get(d.src))
+
+    if "wildcard" in query:
+        (field, spec), = query["wildcard"].items()
+        value, ci = _term_value(spec)
+        regex = re.compile(fnmatch.translate(value), re.IGNORECASE if ci else 0)
+        get = field_getter(field)
+        return lambda d: any(regex.match(str(v)) for v in get(d.src))
+
+    if "exists" in query:
+        get = field_getter(query["exists"]["field"])
+        return lambda d: bool(get(d.src))
+
+    if "range" in query:
+        (field, spec), = query["range"].items()
+        if field == "@timestamp":
+            lo, hi = time_bounds(spec, now_ms)
+            return lambda d: lo <= d.ts <= hi
+        get = field_getter(field)
+        checks = []
+        for op, bound in spec.items():
+            if op in ("gt", "gte", "lt", "lte"):
+                checks.append((op, float(bound)))
+
+        def in_range(d):
+            for v in get(d.src):
+                try:
+                    v = float(v)
+                except (TypeError, ValueError):
+                    continue
+                if all(
+                    (op == "gt" and v > b) or (op == "gte" and v >= b) or
+                    (op == "lt" and v < b) or (op == "lte" and v <= b)
+                    for op, b in checks
+                ):
+                    return True
+            return False
+        return in_range
+
+    raise NotImplementedError(f"fake_es: query tidak didukung: {list(query)}")
+
+
+def time_bounds(spec, now_ms):
+    lo, hi = float("-inf"), float("inf")
+    if "gte" in spec:
+        lo = parse_date(spec["gte"], now_ms)
+    if "gt" in spec:
+        lo = parse_date(spec["gt"], now_ms, round_up=True) + 1
+    if "lte" in spec:
+        hi = parse_date(spec["lte"], now_ms, round_up=True)
+    if "lt" in spec:
+        hi = parse_date(spec["lt"], now_ms) - 1
+    return lo, hi
+
+
+def _top_level_time_range(query, now_ms):
+    """Range @timestamp di filter teratas → dipakai untuk bisect."""
+    lo, hi = float("-inf"), float("inf")
+    for clause in (query or {}).get("bool", {}).get("filter", []):
+        spec = clause.get("range", {}).get("@timestamp")
+        if spec:
+            c_lo, c_hi = time_bounds(spec, now_ms)
+            lo, hi = max(lo, c_lo), min(hi, c_hi)
+    return lo, hi
+
+
+# ======================================================
+# FAKE CLIENT
+# ======================================================
+
+class _FakeCat:
+    def __init__(self, es):
+        self.es = es
+
+    def indices(self, index=None, **kwargs):
+        names = self.es._indices(index)
+        names = names if names is not None else {d.index for d in self.es.docs}
+        return [{"index": name} for name in sorted(names)]
+
+
+class FakeElasticsearch:
+    """
+    docs: list (ts_ms, _index, _id, _source) dari generator.generate_documents.
+    roundtrip: encode+decode JSON setiap response (meniru transport).
+    """
+
+    def __init__(self, docs, roundtrip=True):
+        ordered = sorted(docs, key=lambda d: d[0])
+        self.docs = [_Doc(ts, seq, index, doc_id, src) for seq, (ts, index, doc_id, src) in enumerate(ordered)]
+        self.ts = [d.ts for d in self.docs]
+        self.roundtrip = roundtrip
+        self.searches = 0
+        self.took_ms = 0.0
+        self.response_bytes = 0
+        self._pit_ids = itertools.count(1)
+        self._stats_lock = threading.Lock()
+        self.cat = _FakeCat(self)
+
+    # ---------------- API client ----------------
+
+    def ping(self, **kwargs):
+        return True
+
+    def close(self):
+        pass
+
+    def open_point_in_time(self, index=None, keep_alive=None, **kwargs):
+        return {"id": f"pit-{next(self._pit_ids)}"}
+
+    def close_point_in_time(self, body=None, **kwargs):
+        return {"succeeded": True, "num_freed": 1}
+
+    def count(self, index=None, body=None, **kwargs):
+        now_ms = int(time.time() * 1000)
+        return self._respond({"count": len(self._match(index, (body or {}).get("query"), now_ms))}, kwargs)
+
+    def search(self, index=None, body=None, filter_path=None, **kwargs):
+        started = time.perf_counter()
+        body = body or {}
+        now_ms = int(time.time() * 1000)
+        matched = self._match(index, body.get("query"), now_ms)
+
+        res = {"took": 0, "timed_out": False,
+               "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0}}
+        res["hits"] = self._hits(matched, body)
+        if "pit" in body:
+            res["pit_id"] = body["pit"]["id"]
+        if body.get("aggs"):
+            res["aggregations"] = self._aggs(matched, body["aggs"], now_ms)
+
+        took = (time.perf_counter() - started) * 1000
+        res["took"] = int(took)
+        with self._stats_lock:
+            self.searches += 1
+            self.took_ms += took
+        if filter_path:
+            res = apply_filter_path(res, filter_path)
+        return self._respond(res, kwargs)
+
+    # ---------------- internals ----------------
+
+    def _respond(self, res, kwargs):
+        if not self.roundtrip:
+            return res
+        body = orjson.dumps(res)
+        with self._stats_lock:
+            self.response_bytes += len(body)
+        return orjson.loads(body)
+
+    def _indices(self, index):
+        """
+        Backing index yang cocok dengan pola (nama data stream atau backing index).
+        -pola setelah wildcard mengecualikan index yang cocok, seperti di ES.
+        """
+        if not index or index in ("_all", "*"):
+            return None
+        patterns = index if isinstance(index, (list, tuple)) else str(index).split(",")
+        names = {d.index for d in self.docs}
+        selected = set()
+        wildcard = False
+        for p in patterns:
+            exclude = wildcard and p.startswith("-")
+            p = p[1:] if exclude else p
+            wildcard = wildcard or "*" in p
+            for name in names:
+                stream = _BACKING_INDEX.sub("", name[4:]) if name.startswith(".ds-") else name
+                if fnmatch.fnmatchcase(name, p) or fnmatch.fnmatchcase(stream, p):
+                    if exclude:
+                        selected.discard(name)
+                    else:
+                        selected.add(name)
+        return selected
+
+    def _match(self, index, query, now_ms):
+        lo, hi = _top_level_time_range(query, now_ms)
+        start = bisect.bisect_left(self.ts, lo) if lo != float("-inf") else 0
+        end = bisect.bisect_right(self.ts, hi) if hi != float("inf") else len(self.ts)
+        pred = compile_query(query, now_ms)
+        indices = self._indices(index)
+        return [
+            d for d in itertools.islice(self.docs, start, end)
+            if (indices is None or d.index in indices) and pred(d)
+        ]
+
+    def _sort_key(self, sort):
+        """Return (fungsi key, descending, format epoch_millis?)."""
+        spec = sort or [{"_doc": {"order": "asc"}}]
+        fields = []
+        for item in spec:
+            if isinstance(item, str):
+                fields.append((item, "asc"))
+            else:
+                (field, opts), = item.items()
+                fields.append((field, opts.get("order", "asc") if isinstance(opts, dict) else opts))
+        descending = fields[0][1] == "desc"
+
+        def key(d):
+            values = []
+            for field, _ in fields:
+                if field == "@timestamp":
+                    values.append(d.ts)
+                elif field in ("_shard_doc", "_doc"):
+                    values.append(d.seq)
+                elif field == "_index":
+                    values.append(d.index)
+                elif field == "_seq_no":
+                    values.append(d.seq)
+                else:
+                    v = field_getter(field)(d.src)
+                    values.append(v[0] if v else None)
+            return values
+        return key, descending
+
+    def _hit(self, d, source_spec, sort_values=None):
+        hit = {"_index": d.index, "_id": d.id, "_score": None,
+               "_source": apply_source_filter(d.src, source_spec)}
+        if sort_values is not None:
+            hit["sort"] = sort_values
+        return hit
+
+    def _hits(self, matched, body):
+        size = body.get("size", 10)
+        hits = {}
+        if body.get("track_total_hits", True) is not False:
+            hits["total"] = {"value": min(len(matched), 10000), "relation": "eq" if len(matched) <= 10000 else "gte"}
+        hits["max_score"] = None
+
+        if not size:
+            hits["hits"] = []
+            return hits
+
+        key, descending = self._sort_key(body.get("sort"))
+        if self._is_time_sort(body.get("sort")):
+            # matched sudah urut naik berdasarkan waktu
+            ordered = reversed(matched) if descending else matched
+        else:
+            ordered = sorted(matched, key=key, reverse=descending)
+
+        after = body.get("search_after")
+        collapse = (body.get("collapse") or {}).get("field")
+        collapse_get = field_getter(collapse) if collapse else None
+        collapsed = set()
+        result = []
+        for d in ordered:
+            values = key(d)
+            if after is not None:
+                if descending and not values < list(after):
+                    continue
+                if not descending and not values > list(after):
+                    continue
+            hit = self._hit(d, body.get("_source"), values if body.get("sort") else None)
+            if collapse_get is not None:
+                # Hanya hit teratas per nilai field collapse
+                value = (collapse_get(d.src) or [None])[0]
+                if value in collapsed:
+                    continue
+                collapsed.add(value)
+                hit["fields"] = {collapse: [value]}
+            result.append(hit)
+            if len(result) >= size:
+                break
+        hits["hits"] = result
+        return hits
+
+    @staticmethod
+    def _is_time_sort(sort):
+        """Sort @timestamp (+ _shard_doc/_doc searah) → cukup urutan penyimpanan."""
+        if not sort:
+            return False
+        fields = []
+        for item in sort:
+            if isinstance(item, str):
+                fields.append((item, "asc"))
+            else:
+                (field, opts), = item.items()
+                fields.append((field, opts.get("order", "asc") if isinstance(opts, dict) else opts))
+        if fields[0][0] != "@timestamp":
+            return False
+        return all(f in ("_shard_doc", "_doc") and o == fields[0][1] for f, o in fields[1:])
+
+    # ---------------- agregasi ----------------
+
+    def _aggs(self, docs, spec, now_ms):
+        out = {}
+        for name, agg in spec.items():
+            sub = agg.get("aggs") or agg.get("aggregations") or {}
+            if "filter" in agg:
+                pred = compile_query(agg["filter"], now_ms)
+                selected = [d for d in docs if pred(d)]
+                out[name] = dict({"doc_count": len(selected)}, **self._aggs(selected, sub, now_ms))
+            elif "terms" in agg:
+                out[name] = self._terms(docs, agg["terms"], sub, now_ms)
+            elif "composite" in agg:
+                out[name] = self._composite(docs, agg["composite"], sub, now_ms)
+            elif "top_hits" in agg:
+                out[name] = self._top_hits(docs, agg["top_hits"])
+            elif "min" in agg or "max" in agg:
+                out[name] = self._min_max(docs, agg)
+            elif "date_histogram" in agg:
+                out[name] = self._date_histogram(docs, agg["date_histogram"], sub, now_ms)
+            else:
+                raise NotImplementedError(f"fake_es: agregasi tidak didukung: {list(agg)}")
+        return out
+
+    def _terms(self, docs, spec, sub, now_ms):
+        field = spec["field"]
+        get = (lambda src: None) if field == "_index" else field_getter(field)
+        groups = {}
+        for d in docs:
+            values = [d.index] if field == "_index" else get(d.src)
+            if not values:
+                if "missing" not in spec:
+                    continue
+                values = [spec["missing"]]
+            for v in values:
+                groups.setdefault(v, []).append(d)
+
+        ordered = sorted(groups.items(), key=lambda kv: (-len(kv[1]), str(kv[0])))
+        size = spec.get("size", 10)
+        buckets = [
+            dict({"key": key, "doc_count": len(group)}, **self._aggs(group, sub, now_ms))
+            for key, group in ordered[:size]
+        ]
+        return {
+            "doc_count_error_upper_bound": 0,
+            "sum_other_doc_count": sum(len(g) for _, g in ordered[size:]),
+            "buckets": buckets,
+        }
+
+    def _composite(self, docs, spec, sub, now_ms):
+        """Composite dengan sumber terms saja (+ missing_bucket), urut key naik, paging lewat after."""
+        sources = [
+            (name, field_getter(src["terms"]["field"]), src["terms"].get("missing_bucket", False))
+            for item in spec["sources"] for name, src in item.items()
+        ]
+        names = [name for name, _, _ in sources]
+        groups = {}
+        for d in docs:
+            key = []
+            for _, get, missing_bucket in sources:
+                values = get(d.src)
+                if not values and not missing_bucket:
+                    break
+                key.append(values[0] if values else None)
+            else:
+                groups.setdefault(tuple(key), []).append(d)
+
+        def order(key):
+            # missing_bucket: null paling awal pada urutan naik
+            return tuple((v is not None, v) for v in key)
+
+        keys = sorted(groups, key=order)
+        if spec.get("after"):
+            after = order(tuple(spec["after"][name] for name in names))
+            keys = [k for k in keys if order(k) > after]
+        keys = keys[:spec.get("size", 10)]
+
+        buckets = [
+            dict({"key": dict(zip(names, key)), "doc_count": len(groups[key])}, **self._aggs(groups[key], sub, now_ms))
+            for key in keys
+        ]
+        result = {"buckets": buckets}
+        if buckets:
+            result["after_key"] = buckets[-1]["key"]
+        return result
+
+    def _top_hits(self, docs, spec):
+        key, descending = self._sort_key(spec.get("sort"))
+        ordered = sorted(docs, key=key, reverse=descending)[:spec.get("size", 3)]
+        return {"hits": {
+            "total": {"value": len(docs), "relation": "eq"},
+            "max_score": None,
+            "hits": [self._hit(d, spec.get("_source"), key(d) if spec.get("sort") else None) for d in ordered],
+        }}
+
+    def _min_max(self, docs, agg):
+        op = "min" if "min" in agg else "max"
+        field = agg[op]["field"]
+        if field == "@timestamp":
+            values = [d.ts for d in docs]
+        else:
+            values = [float(v) for d in docs for v in field_getter(field)(d.src)]
+        if not values:
+            return {"value": None}
+        value = min(values) if op == "min" else max(values)
+        result = {"value": float(value)}
+        if field == "@timestamp":
+            result["value_as_string"] = format_date(int(value))
+        return result
+
+    def _date_histogram(self, docs, spec, sub, now_ms):
+        tz = ZoneInfo(spec.get("time_zone", "UTC"))
+        pattern = spec.get("format")
+        bounds = spec.get("extended_bounds")
+
+        if "calendar_interval" in spec:
+            if spec["calendar_interval"] not in ("1d", "day"):
+                raise NotImplementedError("fake_es: calendar_interval selain 1d")
+
+            def bucket_of(ms):
+                local = datetime.fromtimestamp(ms / 1000, tz=tz)
+                midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+                return int(midnight.timestamp() * 1000)
+
+            def next_bucket(ms):
+                local = datetime.fromtimestamp(ms / 1000, tz=tz) + timedelta(days=1)
+                return bucket_of(int(local.timestamp() * 1000))
+        else:
+            interval = _interval_ms(spec["fixed_interval"])
+            offset = _interval_ms(spec["offset"]) if spec.get("offset") else 0
+
+            def bucket_of(ms):
+                return (ms - offset) // interval * interval + offset
+
+            def next_bucket(ms):
+                return ms + interval
+
+        groups = {}
+        for d in docs:
+            groups.setdefault(bucket_of(d.ts), []).append(d)
+
+        keys = set(groups)
+        if spec.get("min_doc_count", 1) == 0 and (keys or bounds):
+            lo = min(keys) if keys else None
+            hi = max(keys) if keys else None
+            if bounds:
+                b_lo = bucket_of(parse_date(bounds["min"], now_ms))
+                b_hi = bucket_of(parse_date(bounds["max"], now_ms))
+                lo = b_lo if lo is None else min(lo, b_lo)
+                hi = b_hi if hi is None else max(hi, b_hi)
+            key = lo
+            while key <= hi:
+                keys.add(key)
+                key = next_bucket(key)
+
+        min_count = spec.get("min_doc_count", 1)
+        buckets = []
+        for key in sorted(keys):
+            group = groups.get(key, [])
+            if len(group) < min_count:
+                continue
+            bucket = {"key_as_string": format_date(key, pattern, tz), "key": key, "doc_count": len(group)}
+            bucket.update(self._aggs(group, sub, now_ms))
+            buckets.append(bucket)
+        return {"buckets": buckets}
@@ -0,0 +1,178 @@
+# benchmarks/generator.py
+"""
+Generator dokumen sintetis Suricata / Sophos XG / PAN-OS dengan bentuk ECS
+yang sama seperti index produksi (field yang dibaca service + beberapa
+field vendor lain), untuk volume berapa pun.
+
+Sub-objek yang berulang (geo per IP, rule, threat, severity) dipakai
+bersama antar dokumen supaya 1 juta dokumen tetap muat di memori.
+"""
+import random
+import time
+from datetime import datetime, timezone
+
+SOURCE_MIX = (("suricata", 0.5), ("sophos", 0.25), ("panw", 0.25))
+
+INDEX_GENERIC = ".ds-logs-generic-default-2024.01.01-000001"
+INDEX_PANW = ".ds-logs-panw.panos-default-2024.01.01-000001"
+SOURCE_INDEX = {"suricata": INDEX_GENERIC, "sophos": INDEX_GENERIC, "panw": INDEX_PANW}
+
+COUNTRIES = [
+    ("Indonesia", -6.2, 106.8), ("United States", 37.7, -122.4), ("China", 39.9, 116.4),
+    ("Russia", 55.7, 37.6), ("Netherlands", 52.3, 4.9), ("Singapore", 1.3, 103.8),
+    ("Germany", 50.1, 8.7), ("Brazil", -23.5, -46.6), ("India", 19.0, 72.8), ("Vietnam", 21.0, 105.8),
+]
+MITRE_STAGES = [
+    "Reconnaissance", "Initial Access", "Execution", "Persistence", "Privilege Escalation",
+    "Defense Evasion", "Credential Access", "Discovery", "Lateral Movement",
+    "Collection", "Command and Control", "Exfiltration", "Impact",
+]
+SURICATA_CATEGORIES = [
+    "Attempted Information Leak", "Potentially Bad Traffic", "A Network Trojan was detected",
+    "Misc activity", "Attempted Administrator Privilege Gain", "Web Application Attack",
+]
+SEVERITIES = [("Low", 0.5), ("Medium", 0.3), ("High", 0.15), ("Critical", 0.05)]
+PORTS = [80, 443, 22, 3389, 445, 53, 8080, 25, 3306, 1433]
+
+
+def _utc_iso(ts_ms):
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.") + f"{ts_ms % 1000:03d}Z"
+
+
+class _Pools:
+    """Nilai kategorikal yang dipakai bersama (distribusi miring seperti data asli)."""
+
+    def __init__(self, rng, n_rules=300, n_internal=2000, n_external=5000):
+        self.rng = rng
+        self.internal = [
+            {"ip": f"192.168.{i // 250}.{i % 250 + 1}",
+             "geo": {"country_name": "Indonesia", "location": {"lat": -6.2, "lon": 106.8}}}
+            for i in range(n_internal)
+        ]
+        self.external = []
+        for i in range(n_external):
+            country, lat, lon = COUNTRIES[i % len(COUNTRIES)]
+            self.external.append({
+                "ip": f"{rng.randint(11, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+                "geo": {"country_name": country, "location": {"lat": lat, "lon": lon}},
+            })
+        self.rules = [
+            {"name": f"ET POLICY Suspicious rule {i}", "category": SURICATA_CATEGORIES[i % len(SURICATA_CATEGORIES)]}
+            for i in range(n_rules)
+        ]
+        self.threats = [{"name": f"Threat signature {i}", "id": str(40000 + i)} for i in range(n_rules)]
+        self.sophos_messages = [f"IPS detection {i}" for i in range(n_rules)]
+        self.severities = [s for s, _ in SEVERITIES]
+        self.severity_weights = [w for _, w in SEVERITIES]
+
+    def skewed(self, items):
+        # ~80% event jatuh ke ~20% nilai teratas
+        n = len(items)
+        return items[min(n - 1, int(n * self.rng.random() ** 3))]
+
+
+def _endpoints(pools, rng):
+    internal = pools.skewed(pools.internal)
+    external = pools.skewed(pools.external)
+    if rng.random() < 0.6:
+        return external, internal
+    return internal, external
+
+
+def _suricata(pools, rng, ts, uid):
+    src, dst = _endpoints(pools, rng)
+    return {
+        "@timestamp": ts,
+        "event": {"module": "suricata", "dataset": "suricata.eve", "kind": "alert",
+                  "severity_label": rng.choices(pools.severities, pools.severity_weights)[0]},
+        "rule": pools.skewed(pools.rules),
+        "source": dict(src, port=rng.randint(1024, 65535)),
+        "destination": dict(dst, port=rng.choice(PORTS)),
+        "network": {"transport": rng.choice(("tcp", "udp")), "community_id": f"1:{uid}"},
+        "mitre": {"stages": rng.choice(MITRE_STAGES)},
+        "log": {"id": {"uid": uid}},
+        "suricata": {"eve": {"flow_id": uid, "in_iface": "eth1", "alert": {"gid": 1, "rev": 3}}},
+    }
+
+
+def _sophos(pools, rng, ts, uid):
+    src, dst = _endpoints(pools, rng)
+    log_type = "IDP" if rng.random() < 0.7 else "Content Filtering"
+    return {
+        "@timestamp": ts,
+        "event": {"module": "sophos", "dataset": "sophos.xg",
+                  "severity_label": rng.choices(pools.severities, pools.severity_weights)[0]},
+        "source": dict(src, port=rng.randint(1024, 65535)),
+        "destination": dict(dst, port=rng.choice(PORTS)),
+        "network": {"transport": "tcp"},
+        "mitre": {"stages": rng.choice(MITRE_STAGES)},
+        "log": {"level": "warning", "id": {"uid": uid}},
+        "sophos": {"xg": {
+            "log_type": log_type,
+            "message": pools.skewed(pools.sophos_messages),
+            "app_name": rng.choice(("HTTP", "HTTPS", "SMB", "DNS")),
+            "dst_port": rng.choice(PORTS),
+            "device_name": "XG230", "log_component": "Signatures",
+        }},
+    }
+
+
+def _panw(pools, rng, ts, uid):
+    src, dst = _endpoints(pools, rng)
+    return {
+        "@timestamp": ts,
+        "event": {"module": "panw", "dataset": "panw.panos"},
+        "source": dict(src, port=rng.randint(1024, 65535)),
+        "destination": dict(dst, port=rng.choice(PORTS)),
+        "network": {"transport": "tcp"},
+        "mitre": {"stages": rng.choice(MITRE_STAGES)},
+        "log": {"syslog": {"severity": {"name": rng.choice(("low", "medium", "high", "critical"))}}},
+        "panw": {"panos": {
+            "type": "THREAT",
+            "sub_type": rng.choice(("file", "vulnerability")),
+            "seqno": uid,
+            "app": rng.choice(("web-browsing", "ssl", "smb", "dns")),
+            "threat": pools.skewed(pools.threats),
+            "dest_port": rng.choice(PORTS),
+            "action": "alert", "rule": "outbound-default",
+        }},
+    }
+
+
+BUILDERS = {"suricata": _suricata, "sophos": _sophos, "panw": _panw}
+
+
+def backing_index(index, generation, ts_ms):
+    """Nama backing index generation ke-N, mis. .ds-logs-generic-default-2024.01.02-000002."""
+    stream = index[4:].rsplit("-", 2)[0]
+    day = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y.%m.%d")
+    return f".ds-{stream}-{day}-{generation:06d}"
+
+
+def generate_documents(n, window_hours=24, seed=42, now_ms=None, rollover_hours=None):
+    """
+    n dokumen tersebar merata dalam window_hours terakhir.
+    rollover_hours: kalau diisi, data stream di-rollover tiap N jam
+    (satu backing index per periode, seperti ILM).
+    Return list (ts_ms, _index, _id, _source), urut naik berdasarkan waktu.
+    """
+    rng = random.Random(seed)
+    pools = _Pools(rng)
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    start_ms = now_ms - int(window_hours * 3600 * 1000)
+
+    sources = [s for s, _ in SOURCE_MIX]
+    weights = [w for _, w in SOURCE_MIX]
+
+    timestamps = sorted(rng.randint(start_ms, now_ms) for _ in range(n))
+    docs = []
+    for i, ts_ms in enumerate(timestamps):
+        source = rng.choices(sources, weights)[0]
+        doc = BUILDERS[source](pools, rng, _utc_iso(ts_ms), str(i))
+        index = SOURCE_INDEX[source]
+        if rollover_hours:
+            generation = (ts_ms - start_ms) // int(rollover_hours * 3600 * 1000) + 1
+            index = backing_index(index, generation, start_ms + (generation - 1) * int(rollover_hours * 3600 * 1000))
+        docs.append((ts_ms, index, str(i), doc))
+    return docs
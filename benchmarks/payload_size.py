@@ -0,0 +1,128 @@
+# benchmarks/payload_size.py
+"""
+Ukuran & waktu parse response Elasticsearch: full vs trimmed
+(_source includes + filter_path), mentah dan gzip.
+
+Dokumen sintetis meniru bentuk dokumen Sophos XG / PAN-OS asli (tree
+sophos.xg.* / panw.panos.* yang lebar), response dibentuk seperti hasil
+get_sophos_events / get_panw_events (500 hit + timeline).
+
+    python -m benchmarks.payload_size
+    BENCH_HITS=2000 python -m benchmarks.payload_size
+"""
+import gzip
+import json
+import os
+import random
+import time
+
+from app.services import SOURCE_INCLUDES, DOC_FILTER_PATH, HIT_NORMALIZERS
+from benchmarks.fake_es import apply_filter_path, apply_source_filter
+
+BENCH_HITS = int(os.getenv("BENCH_HITS", "500"))
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "20"))
+
+
+def _ip(prefix="192.168"):
+    return f"{prefix}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+
+
+def _filler(prefix, n):
+    # Field vendor yang tidak dipakai normalizer
+    return {f"{prefix}_{i}": f"value-{random.randint(0, 10 ** 6)}" for i in range(n)}
+
+
+def _common(ts):
+    return {
+        "@timestamp": ts,
+        "source": {"ip": _ip(), "port": random.randint(1024, 65535), "bytes": random.randint(0, 10 ** 6),
+                   "geo": {"country_name": "Indonesia", "city_name": "Jakarta",
+                           "location": {"lat": -6.2, "lon": 106.8}}},
+        "destination": {"ip": _ip("10.0"), "port": random.choice([80, 443, 22, 3389]),
+                        "geo": {"country_name": "United States", "location": {"lat": 37.7, "lon": -122.4}}},
+        "network": {"transport": "tcp", "direction": "inbound", "bytes": random.randint(0, 10 ** 6)},
+        "event": {"severity_label": random.choice(["Low", "Medium", "High"]), "module": "x",
+                  "dataset": "x.log", "ingested": ts, "original": "<134>" + "x" * 400},
+        "log": {"level": "warning", "id": {"uid": str(random.randint(0, 10 ** 9))},
+                "syslog": {"severity": {"name": "high", "code": 2}, "facility": {"name": "local0"}}},
+        "agent": {"id": "a1b2c3", "name": "fleet-agent", "type": "filebeat", "version": "8.11.0"},
+        "ecs": {"version": "8.0.0"},
+        "host": {"name": "log-collector-01", "ip": [_ip(), _ip()]},
+        "tags": ["forwarded", "preserve_original_event"],
+    }
+
+
+def sophos_doc(ts):
+    doc = _common(ts)
+    doc["sophos"] = {"xg": dict(
+        _filler("attr", 60),
+        log_type="IDP", message="Possible exploit attempt", rule_name="IPS-1",
+        app_name="HTTP", dst_port=443,
+    )}
+    return doc
+
+
+def panw_doc(ts):
+    doc = _common(ts)
+    doc["panw"] = {"panos": dict(
+        _filler("attr", 80),
+        sub_type="vulnerability", seqno=random.randint(0, 10 ** 9), app="web-browsing",
+        threat={"name": "SQL Injection", "id": "40001"}, dest_port=443,
+    )}
+    return doc
+
+
+def _response(docs):
+    return {
+        "took": 37, "timed_out": False,
+        "_shards": {"total": 12, "successful": 12, "skipped": 0, "failed": 0},
+        "hits": {
+            "total": {"value": 10000, "relation": "gte"}, "max_score": None,
+            "hits": [
+                {"_index": ".ds-logs-2024.01.01-000001", "_id": str(i), "_score": None,
+                 "_source": d, "sort": [1704067200000 - i]}
+                for i, d in enumerate(docs)
+            ]
+        },
+        "aggregations": {"timeline": {"buckets": [
+            {"key_as_string": f"2024-01-01 {h:02d}:00", "key": 1704067200000 + h * 3600000, "doc_count": 42}
+            for h in range(24)
+        ]}}
+    }
+
+
+def _measure(label, body, normalize):
+    raw = json.dumps(body).encode()
+    zipped = gzip.compress(raw)
+
+    start = time.perf_counter()
+    for _ in range(BENCH_ROUNDS):
+        res = json.loads(raw)
+        for h in res.get("hits", {}).get("hits", []):
+            normalize(h.get("_source", {}))
+    elapsed = (time.perf_counter() - start) / BENCH_ROUNDS
+
+    print(f"  {label:<8} raw {len(raw) / 1024:9.1f} KiB   gzip {len(zipped) / 1024:8.1f} KiB   "
+          f"parse+normalize {elapsed * 1000:7.2f} ms")
+    return len(raw), len(zipped), elapsed
+
+
+def run():
+    random.seed(42)
+    print(f"{BENCH_HITS} hits, {BENCH_ROUNDS} rounds")
+    for source, make_doc in (("sophos", sophos_doc), ("panw", panw_doc)):
+        docs = [make_doc("2024-01-01T00:00:00.000Z") for _ in range(BENCH_HITS)]
+        full = _response(docs)
+        trimmed = _response([apply_source_filter(d, SOURCE_INCLUDES[source]) for d in docs])
+        trimmed = apply_filter_path(trimmed, DOC_FILTER_PATH)
+
+        print(source)
+        before = _measure("full", full, HIT_NORMALIZERS[source])
+        after = _measure("trimmed", trimmed, HIT_NORMALIZERS[source])
+        print(f"  → raw x{before[0] / after[0]:.1f} lebih kecil, "
+              f"over the wire (gzip) x{before[0] / after[1]:.1f}, "
+              f"parse x{before[2] / after[2]:.1f} lebih cepat")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,75 @@
+# benchmarks/serialization.py
+"""
+Encode/decode JSON: bawaan (json + jsonable_encoder FastAPI) vs orjson,
+untuk payload realistis 1.500 event (500 per source seperti /events/filter).
+
+    python -m benchmarks.serialization
+    BENCH_EVENTS=3000 python -m benchmarks.serialization
+"""
+import json
+import os
+import time
+
+from elasticsearch.serializer import JSONSerializer
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.serialization import ORJSONSerializer, EventJSONResponse
+from app.services import SOURCE_INCLUDES, HIT_NORMALIZERS
+from benchmarks.fake_es import apply_source_filter
+from benchmarks.payload_size import sophos_doc, panw_doc, _response
+
+BENCH_EVENTS = int(os.getenv("BENCH_EVENTS", "1500"))
+BENCH_ROUNDS = int(os.getenv("BENCH_ROUNDS", "20"))
+
+
+def _timeit(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(BENCH_ROUNDS):
+        fn()
+    return (time.perf_counter() - start) / BENCH_ROUNDS * 1000
+
+
+def _report(label, old, new):
+    print(f"  {label:<34} json {old:8.2f} ms   orjson {new:8.2f} ms   x{old / new:.1f}")
+
+
+def run():
+    per_source = BENCH_EVENTS // 3
+    docs = {
+        "sophos": [sophos_doc("2024-01-01T00:00:00.000Z") for _ in range(per_source)],
+        "panw": [panw_doc("2024-01-01T00:00:00.000Z") for _ in range(BENCH_EVENTS - per_source)],
+    }
+    events = [
+        HIT_NORMALIZERS[source](apply_source_filter(d, SOURCE_INCLUDES[source]))
+        for source, source_docs in docs.items()
+        for d in source_docs
+    ]
+    payload = {"timeframe": "last24hours", "count": len(events), "events": events}
+
+    # Response Elasticsearch mentah (sebelum & sesudah trimming _source)
+    es_body = json.dumps(_response(docs["panw"]))
+    std, fast = JSONSerializer(), ORJSONSerializer()
+    query = {"query": {"bool": {"filter": [{"term": {"source.ip": "192.168.1.1"}}] * 50}}}
+
+    print(f"{len(events)} events, {BENCH_ROUNDS} rounds")
+    _report(
+        "API response encode",
+        _timeit(lambda: JSONResponse(jsonable_encoder(payload)).body),
+        _timeit(lambda: EventJSONResponse(payload).body),
+    )
+    _report(
+        f"ES response decode ({len(es_body) // 1024} KiB)",
+        _timeit(lambda: std.loads(es_body)),
+        _timeit(lambda: fast.loads(es_body)),
+    )
+    _report(
+        "ES request body encode",
+        _timeit(lambda: std.dumps(query)),
+        _timeit(lambda: fast.dumps(query)),
+    )
+
+
+if __name__ == "__main__":
+    run()
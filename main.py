@@ -1,5 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from app.routers import threat_routes
+from app.elastic_client import elastic_manager
+from app.circuit_breaker import CircuitOpenError
+from app.metrics import render_metrics
+from app.ingest_rate import ingest_rate_sampler
+from app.index_resolver import index_resolver
+from app.materializer import summary_materializer, MATERIALIZER_ENABLED
+from app.event_store import event_store, EVENT_STORE_ENABLED
 # Import CORSMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
@@ -38,6 +46,44 @@ app.add_middleware(
 
 app.include_router(threat_routes.router)
 
+@app.exception_handler(CircuitOpenError)
+def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    # Source sedang dimatikan sementara dan belum ada hasil lama untuk dipakai
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, int(exc.retry_after)))}
+    )
+
+@app.on_event("startup")
+def start_background_jobs():
+    # Health check & reconnect Elasticsearch di background (startup tidak menunggu cluster)
+    elastic_manager.start()
+    # Sampler ingest rate untuk angka "seconds" di /events/summary & /events/rate
+    ingest_rate_sampler.start()
+    # Cache rentang @timestamp backing index → query hanya ke index yang overlap window
+    index_resolver.start()
+    # Rolling store (opt-in): backfill sekali, lalu hanya delta per interval
+    if EVENT_STORE_ENABLED:
+        event_store.start()
+    # Precompute /events/summary untuk timeframe standar
+    if MATERIALIZER_ENABLED:
+        summary_materializer.start()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    ingest_rate_sampler.stop()
+    index_resolver.stop()
+    summary_materializer.stop()
+    event_store.stop()
+    elastic_manager.stop()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Di-scrape Prometheus: latency es.search & took, durasi tiap tahap, cache, ukuran response
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 def read_root():
     return {"message": "Threat Analytics API is running 🚀"}
\ No newline at end of file